@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""
+Benchmark rendering of morphologies in swc view.
+
+Every reconstruction is drawn with the non-interactive Agg backend in each
+line mode (one Line3DCollection per color, or one NaN-separated line per
+color) and saved to an in-memory PNG image. The best of the repeated render
+times is reported per file and mode.
+"""
+
+import argparse
+import io
+import time
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from treem import Morph  # noqa: E402
+from treem.utils.plot import plot_neuron  # noqa: E402
+
+MODES = {'collection': False, 'single-line': True}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', type=str, nargs='+', help='input file (swc)')
+    parser.add_argument('-n', dest='repeat', type=int, default=3,
+                        help='number of repeats [3]')
+    return parser.parse_args()
+
+
+def render(morph, single_line):
+    fig = plt.figure()
+    ax = fig.add_subplot(projection='3d')
+    start = time.perf_counter()
+    plot_neuron(ax, morph, single_line=single_line)
+    fig.savefig(io.BytesIO(), format='png')
+    elapsed = time.perf_counter() - start
+    plt.close(fig)
+    return elapsed
+
+
+def main(args):
+    print(f'{"file":40s}{"nodes":>8s}' + ''.join(f'{mode:>14s}' for mode in MODES))
+    for reconstruction in args.file:
+        morph = Morph(reconstruction)
+        times = [min(render(morph, single_line) for _ in range(args.repeat))
+                 for single_line in MODES.values()]
+        print(f'{reconstruction:40s}{len(morph.data):8d}'
+              + ''.join(f'{t:14.3f}' for t in times))
+
+
+if __name__ == '__main__':
+    main(parse_args())
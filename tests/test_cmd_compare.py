@@ -0,0 +1,77 @@
+"""Testing CLI command compare."""
+
+import os
+import subprocess
+
+import numpy as np
+
+
+def test_compare(tmp_path):
+    """Tests for distance matrices of features, Sholl profiles and barcodes."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    subprocess.run(['swc', 'measure', 'pass_simple_branch.swc',
+                    'pass_simple_branch_2.swc', 'pass_nmo_1.swc',
+                    '-a', 'sholl', 'tmd', '-o', f'{tmp_path}/test_treem/'],
+                   check=True)
+    for mode in ('features', 'sholl', 'tmd'):
+        proc = subprocess.Popen(['swc', 'compare', tmp_path / 'test_treem',
+                                 '-m', mode, '-p', '3',
+                                 '-o', tmp_path / 'dist.npy'],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        stdout, stderr = proc.communicate()
+        assert proc.returncode == 0
+        assert stdout == ''
+        assert stderr == ''
+        dist = np.load(tmp_path / 'dist.npy')
+        assert dist.shape == (3, 3)
+        assert np.allclose(dist, dist.T)
+        assert np.all(np.diag(dist) == 0)
+        assert np.all(dist[:2, 2] > 0)
+
+
+def test_no_data(tmp_path):
+    """Tests for comparing without required data."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    subprocess.run(['swc', 'measure', 'pass_simple_branch.swc',
+                    '-o', f'{tmp_path}/test_treem/'], check=True)
+    proc = subprocess.Popen(['swc', 'compare', tmp_path / 'test_treem',
+                             '-m', 'sholl', '-o', tmp_path / 'dist.npy'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout.endswith("'no sholl data'.\n")
+    assert stderr == ''
+
+
+def test_sholl_feature(tmp_path):
+    """Tests for choosing one of several Sholl features."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    subprocess.run(['swc', 'measure', 'pass_simple_branch.swc', 'pass_nmo_1.swc',
+                    '-a', 'sholl', '--sholl-res', '10', '20', '--sholl-proj', 'xy',
+                    '-o', f'{tmp_path}/test_treem/'], check=True)
+    proc = subprocess.Popen(['swc', 'compare', tmp_path / 'test_treem',
+                             '-m', 'sholl', '-o', tmp_path / 'dist.npy'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout.endswith('choose with --sholl from sholl_xy_10, sholl_xy_20.\n')
+    assert stderr == ''
+    proc = subprocess.Popen(['swc', 'compare', tmp_path / 'test_treem',
+                             '-m', 'sholl', '--sholl', 'sholl_xy_20',
+                             '-o', tmp_path / 'dist.npy'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert stderr == ''
+    dist = np.load(tmp_path / 'dist.npy')
+    assert dist.shape == (2, 2)
+    assert dist[0, 1] > 0
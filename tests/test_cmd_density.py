@@ -0,0 +1,47 @@
+"""Testing CLI command density."""
+
+import os
+import subprocess
+
+import numpy as np
+
+from treem import Morph
+from treem.morph import get_segments
+
+
+def test_density(tmp_path):
+    """Tests for neurite length density of several files."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    files = ['pass_simple_branch.swc', 'pass_simple_branch_2.swc', 'pass_zjump.swc']
+    proc = subprocess.Popen(['swc', 'density', *files, '-r', '5',
+                             '-o', tmp_path / 'density.npy'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout.splitlines()[-1] == 'voxel: 5'
+    assert stderr == ''
+    grid = np.load(tmp_path / 'density.npy', mmap_mode='r')
+    total = 0
+    for file in files:
+        morph = Morph(file)
+        total += get_segments(morph)[0][morph.data[:, 1] != 1].sum()
+    assert np.isclose(grid.sum(), total, rtol=1e-5)
+
+
+def test_bounds(tmp_path):
+    """Tests for density on a fixed grid, skipping failed files."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'density', 'pass_simple_branch.swc',
+                             'fail_not_array_1.swc',
+                             '-b', '-50', '50', '-50', '50', '-20', '20',
+                             '-o', tmp_path / 'density.npy'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout == 'origin: -50 -50 -20\nshape: 10 10 4\nvoxel: 10\n'
+    assert stderr.startswith('fail_not_array_1.swc: ')
+    assert np.load(tmp_path / 'density.npy').shape == (10, 10, 4)
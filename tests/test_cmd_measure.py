@@ -3,6 +3,10 @@
 import os
 import subprocess
 
+import numpy as np
+
+from treem.commands.measure import load_columns
+
 
 def test_measure():
     """Tests for morphometric mesurements."""
@@ -69,3 +73,160 @@ def test_soma():
     assert proc.returncode == 0
     assert stdout != ''
     assert stderr == ''
+
+
+def test_sholl_multi():
+    """Tests for Sholl analysis with multiple resolutions and projections."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'measure', 'pass_simple_branch.swc',
+                             '-a', 'sholl', '--sholl-res', '1', '5',
+                             '--sholl-proj', 'xy', '3d'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert 'dend sholl_3d_1       14\n' in stdout
+    assert 'dend sholl_3d_5        3\n' in stdout
+    assert 'dend sholl_xy_1       14\n' in stdout
+    assert 'dend sholl_xy_5        3\n' in stdout
+    assert stderr == ''
+
+
+def test_stream(tmp_path):
+    """Tests for streaming output and skipping of failed files."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    for ext in ('jsonl', 'csv'):
+        proc = subprocess.Popen(['swc', 'measure', 'pass_simple_branch.swc',
+                                 'pass_soma.swc', 'fail_no_data.swc', '-v',
+                                 '-o', tmp_path / f'test_treem.{ext}'],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        stdout, stderr = proc.communicate()
+        assert proc.returncode == 1
+        assert stdout == ''
+        assert '[3/3]' in stderr
+        assert 'fail_no_data.swc: IndexError' in stderr
+    with open(tmp_path / 'test_treem.jsonl', encoding='utf-8') as file:
+        assert len(file.readlines()) == 2
+    with open(tmp_path / 'test_treem.csv', encoding='utf-8') as file:
+        lines = file.readlines()
+        assert lines[0] == 'name,type,feature,value\n'
+        assert 'pass_simple_branch,dend,nterm,3\n' in lines
+
+
+def test_columns(tmp_path):
+    """Tests for columnar binary output."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'measure', 'pass_simple_branch.swc',
+                             'pass_soma.swc', '-a', 'sec', 'seg', 'sholl',
+                             '-o', f'{tmp_path}/test_treem/'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert stderr == ''
+    data = load_columns(tmp_path / 'test_treem')
+    assert sorted(data['name']) == ['pass_simple_branch', 'pass_soma']
+    assert len(data['cell']) == len(data['type']) == len(data['length']) == 3
+    assert len(data['sec_cell']) == len(data['sec_length']) == 5
+    assert len(data['seg_cell']) == len(data['seg_path']) == 12
+    assert np.isclose(np.nansum(data['length']), 16.9705627)
+    assert isinstance(data['sec_length'], np.memmap)
+    assert not [x for x in os.listdir(tmp_path / 'test_treem') if not x.endswith('.npy')]
+
+
+def test_tmd(tmp_path):
+    """Tests for persistence barcodes and images."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'measure', 'pass_simple_branch.swc',
+                             'pass_nmo_1.swc', '-a', 'tmd', '--tmd-filt', 'path',
+                             '-o', f'{tmp_path}/test_treem/'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stderr == ''
+    data = load_columns(tmp_path / 'test_treem')
+    assert len(data['tmd_birth']) == len(data['tmd_row']) == 113
+    assert data['tmd_image'].shape == (len(data['cell']), 50, 50)
+    assert np.all(data['tmd_birth'] >= data['tmd_death'])
+
+
+def test_hull():
+    """Tests for convex hull and principal extents."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'measure', 'pass_nmo_1.swc', '-p', '3',
+                             '--features', 'xdim', '-a', 'hull', 'pca'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stderr == ''
+    values = dict(line.split()[1:] for line in stdout.splitlines()[1:-1])
+    assert list(values) == ['hullarea', 'hullvolume', 'pdim1', 'pdim2', 'pdim3', 'xdim']
+    assert all(float(x) > 0 for x in values.values())
+
+
+def test_features():
+    """Tests for selected features."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'measure', 'pass_simple_branch.swc',
+                             '--features', 'length,nterm', '-a', 'sholl'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == """pass_simple_branch
+dend length      16.9706
+dend nterm             3
+dend sholl             1\n
+"""
+    assert stderr == ''
+
+
+def test_summary(tmp_path):
+    """Tests for population statistics."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'measure', 'pass_simple_branch.swc',
+                             'pass_simple_branch_2.swc', '--summary'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout.startswith('type feature      count')
+    assert 'dend nterm           2        3.5   0.707107          3' in stdout
+    assert stderr == ''
+    proc = subprocess.Popen(['swc', 'measure', 'pass_simple_branch.swc',
+                             'pass_simple_branch_2.swc',
+                             '--summary', tmp_path / 'test_treem.json'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert stderr == ''
+
+
+def test_breadth_first():
+    """Tests for measurements of non depth-first ordered data."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    stdout = []
+    for file in ('pass_simple_branch.swc', 'pass_breadth_first.swc'):
+        proc = subprocess.Popen(['swc', 'measure', file],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        out, _ = proc.communicate()
+        assert proc.returncode == 0
+        stdout.append(out.splitlines()[1:])
+    assert stdout[1] == stdout[0]
+    assert 'dend nterm             3' in stdout[1]
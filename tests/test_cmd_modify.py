@@ -3,6 +3,10 @@
 import os
 import subprocess
 
+import numpy as np
+
+from treem import SEC, Morph, get_secdata
+
 
 def test_scale(tmp_path):
     """Tests for scaling of dimensions."""
@@ -49,6 +53,23 @@ def test_unfold(tmp_path):
     assert stderr == ''
 
 
+def test_smooth(tmp_path):
+    """Tests for smoothing, section lengths are preserved."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'modify', 'pass_nmo_1.swc', '-m', '20',
+                             '-o', tmp_path / 'test_treem.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stderr == ''
+    orig = get_secdata(Morph('pass_nmo_1.swc'))[1:]
+    smooth = get_secdata(Morph(tmp_path / 'test_treem.swc'))[1:]
+    assert np.allclose(smooth[:, SEC.LENGTH], orig[:, SEC.LENGTH], rtol=1e-3)
+    assert np.nanmean(smooth[:, SEC.CONTRAC]) > np.nanmean(orig[:, SEC.CONTRAC])
+
+
 def test_jitter(tmp_path):
     """Tests for node jittering."""
     os.chdir(os.path.dirname(__file__) + '/data')
@@ -81,6 +102,25 @@ def test_jitter_sec(tmp_path):
     assert stderr == ''
 
 
+def test_variants(tmp_path):
+    """Tests for reproducible variants from one input."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    for out in ('a{}.swc', 'b.swc'):
+        proc = subprocess.Popen(['swc', 'modify', 'pass_simple_branch.swc',
+                                 '-j', '1', '--seed', '1', '--variants', '3',
+                                 '-o', tmp_path / out],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        stdout, stderr = proc.communicate()
+        assert proc.returncode == 0
+        assert stdout == ''
+        assert stderr == ''
+    variants = [Morph(tmp_path / f'a{i}.swc').data for i in range(3)]
+    assert not np.allclose(variants[0], variants[1])
+    assert np.allclose(variants[2], Morph(tmp_path / 'b_2.swc').data)
+
+
 def test_twist(tmp_path):
     """Tests for branch twisting."""
     os.chdir(os.path.dirname(__file__) + '/data')
@@ -0,0 +1,83 @@
+"""Testing CLI command pipeline."""
+
+import json
+import os
+import subprocess
+
+import numpy as np
+
+
+def test_pipeline(tmp_path):
+    """Tests for repair and modify steps applied in memory."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    spec = tmp_path / 'spec.json'
+    spec.write_text(json.dumps({'steps': [{'repair': '-t 1 2 3'},
+                                          {'repair': '-f x'},
+                                          {'modify': ['-r', 2]}]}))
+    proc = subprocess.Popen(['swc', 'pipeline', spec, 'pass_simple_branch.swc',
+                             'fail_not_array_1.swc',
+                             '-o', str(tmp_path / '{name}_pip.swc'),
+                             '--timings', tmp_path / 'timings.json'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout == ''
+    assert stderr.startswith('fail_not_array_1.swc: ')
+    orig = np.loadtxt('pass_simple_branch.swc')
+    data = np.loadtxt(tmp_path / 'pass_simple_branch_pip.swc')
+    assert np.allclose(data[:, 2] - data[0, 2], orig[0, 2] - orig[:, 2])
+    assert np.allclose(data[:, 3:5], orig[:, 3:5] + [2, 3])
+    assert np.allclose(data[1:, 5], orig[1:, 5] * 2)
+    with open(tmp_path / 'timings.json', encoding='utf-8') as file:
+        timings = json.load(file)
+    steps = [x[0] for x in timings['pass_simple_branch.swc']['timings']]
+    assert steps == ['load', 'repair', 'repair', 'modify', 'save']
+
+
+def test_invalid_spec(tmp_path):
+    """Tests for spec with unknown command."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    spec = tmp_path / 'spec.json'
+    spec.write_text(json.dumps([{'view': ''}]))
+    proc = subprocess.Popen(['swc', 'pipeline', spec, 'pass_simple_branch.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout == f'cannot read {spec}: invalid command view.\n'
+    assert stderr == ''
+
+
+def test_invalid_options(tmp_path):
+    """Tests for spec step with invalid options."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    spec = tmp_path / 'spec.json'
+    spec.write_text(json.dumps([{'repair': '-t 1 2 3'}, {'modify': '--bogus 3'}]))
+    proc = subprocess.Popen(['swc', 'pipeline', spec, 'pass_simple_branch.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout == (f'cannot read {spec}: step 2 (modify): '
+                      'unrecognized arguments: --bogus 3.\n')
+    assert stderr == ''
+
+
+def test_unsupported_options(tmp_path):
+    """Tests for spec step with options writing several outputs."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    spec = tmp_path / 'spec.json'
+    spec.write_text(json.dumps([{'repair': '--realizations 3'}]))
+    proc = subprocess.Popen(['swc', 'pipeline', spec, 'pass_simple_branch.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout == (f'cannot read {spec}: step 1 (repair): '
+                      '--realizations not supported in pipeline.\n')
+    assert stderr == ''
@@ -0,0 +1,66 @@
+"""Testing CLI command pool."""
+
+import json
+import os
+import subprocess
+
+import numpy as np
+
+
+def test_pool_build(tmp_path):
+    """Tests for building branch library."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    lib = tmp_path / 'pool.lib'
+    proc = subprocess.Popen(['swc', 'pool', 'build', 'pass_nmo_1.swc',
+                             'pass_simple_branch.swc', 'fail_not_array_1.swc',
+                             '-o', lib],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout == ''
+    assert stderr.startswith('fail_not_array_1.swc: ')
+    data = np.load(lib / 'data.npy', mmap_mode='r')
+    branches = np.load(lib / 'branches.npy')
+    orig = np.loadtxt('pass_simple_branch.swc')
+    assert len(data) == len(np.loadtxt('pass_nmo_1.swc')) + len(orig)
+    assert np.all(branches[:, 1] != 1)
+    assert np.all(np.diff(branches[:, 1] * 1000 + branches[:, 3]) >= 0)
+    with open(lib / 'files.json', encoding='utf-8') as file:
+        assert json.load(file) == ['pass_nmo_1.swc', 'pass_simple_branch.swc']
+
+
+def test_pool_repair(tmp_path):
+    """Tests for repairing cut neurites with branch library."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    lib = tmp_path / 'pool.lib'
+    subprocess.run(['swc', 'pool', 'build', 'pass_nmo_1.swc', '-o', lib], check=True)
+    proc = subprocess.Popen(['swc', 'repair', 'pass_nmo_2_cut.swc',
+                             '-c', '322', '341', '547', '1167',
+                             '-d', '5', '--diam', 'breadth',
+                             '--pool', lib,
+                             '--seed', '1',
+                             '-o', tmp_path / 'test_treem.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert stderr == ''
+    data = np.loadtxt(tmp_path / 'test_treem.swc')
+    assert len(data) > len(np.loadtxt('pass_nmo_2_cut.swc'))
+
+
+def test_pool_no_action():
+    """Tests for pool without action."""
+    proc = subprocess.Popen(['swc', 'pool'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 2
+    assert stdout == ''
+    assert stderr.startswith('usage: swc pool')
+    assert 'required: action' in stderr
@@ -1,8 +1,15 @@
 """Testing CLI command repair."""
 
+import json
 import os
 import subprocess
 
+import numpy as np
+
+from treem import SWC, Morph
+from treem.morph import get_parents
+from treem.utils.geom import SpatialHash
+
 
 def test_transpose(tmp_path):
     """Tests for changing location."""
@@ -66,6 +73,25 @@ def test_zjump_align(tmp_path):
     assert stderr == ''
 
 
+def test_zjump_align_many(tmp_path):
+    """Tests for zjump correction in nested nodes."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'repair', 'pass_nmo_1.swc',
+                             '-z', '40', '60', '80', '--zjump', 'align',
+                             '-o', tmp_path / 'test_treem.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert stderr == ''
+    data = np.loadtxt(tmp_path / 'test_treem.swc')
+    for ident in (40, 60, 80):
+        parent = int(data[ident - 1, 6])
+        assert np.isclose(data[ident - 1, 4], data[parent - 1, 4])
+
+
 def test_zjump_split(tmp_path):
     """Tests for zjump correction."""
     os.chdir(os.path.dirname(__file__) + '/data')
@@ -345,6 +371,50 @@ def test_cut_repair_pool(tmp_path):
     assert stderr == ''
 
 
+def _graft_hits(reconstruction, original, cuts, size):
+    """Returns occupied cells of the original crossed by branches grafted at cuts."""
+    morph = Morph(original)
+    coords = morph.data[:, SWC.XYZ]
+    mask = morph.data[:, SWC.T] != SWC.SOMA
+    space = SpatialHash(size)
+    space.add(coords[get_parents(morph)[mask]], coords[mask])
+    coords = {tuple(x) for x in coords.tolist()}
+    repaired = Morph(reconstruction)
+    hits = []
+    for ident in cuts:
+        center = morph.node(ident).coord()
+        node = next(x for x in repaired.root.walk() if np.allclose(x.coord(), center))
+        grafted = [x for x in node.walk() if tuple(x.coord().tolist()) not in coords]
+        starts = np.array([x.parent.coord() for x in grafted])
+        ends = np.array([x.coord() for x in grafted])
+        hits.append(space.count(starts, ends, center=center))
+    return hits
+
+
+def test_cut_repair_collision(tmp_path):
+    """Tests for repairing cut neurites without crossing other neurites."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    cuts = [322, 341, 547, 1167]
+    hits = {}
+    for name, opts in (('free', []),
+                       ('collision', ['--collision', '40', '--collision-retries', '10'])):
+        out = tmp_path / f'test_treem_{name}.swc'
+        proc = subprocess.Popen(['swc', 'repair', 'pass_nmo_2_cut.swc',
+                                 '-c', *map(str, cuts), *opts,
+                                 '--seed', '2',
+                                 '-o', out],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        stdout, stderr = proc.communicate()
+        assert proc.returncode == 0
+        assert stdout == ''
+        assert stderr == ''
+        hits[name] = _graft_hits(out, 'pass_nmo_2_cut.swc', cuts, 40)
+    assert sum(hits['free']) > 0
+    assert hits['collision'] == [0, 0, 0, 0]
+
+
 def test_cut_delete(tmp_path):
     """Tests for repairing cut neurites."""
     os.chdir(os.path.dirname(__file__) + '/data')
@@ -373,3 +443,59 @@ def test_cut_resample(tmp_path):
     assert proc.returncode == 0
     assert stdout == ''
     assert stderr == ''
+
+
+def test_manifest(tmp_path):
+    """Tests for repairing files listed in manifest."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps({'pass_nmo_2_cut.swc': {'cut': [322, 341, 547, 1167]},
+                                    'pass_simple_branch.swc': {'cut': [7, 11, 13]},
+                                    'fail_not_array_1.swc': {}}))
+    for out in ('run1', 'run2'):
+        proc = subprocess.Popen(['swc', 'repair', '--manifest', manifest, '--seed', '1',
+                                 '-o', str(tmp_path / (out + '_{name}.swc'))],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        stdout, stderr = proc.communicate()
+        assert proc.returncode == 4
+        assert stdout == 'files repaired: 2, failed: 1\npoints not repaired: 3\n'
+        assert stderr.startswith('fail_not_array_1.swc: ')
+    for name in ('pass_nmo_2_cut', 'pass_simple_branch'):
+        run1 = np.loadtxt(tmp_path / f'run1_{name}.swc')
+        run2 = np.loadtxt(tmp_path / f'run2_{name}.swc')
+        assert np.array_equal(run1, run2)
+
+
+def test_realizations(tmp_path):
+    """Tests for several realizations of repair."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'repair', 'pass_nmo_2_cut.swc',
+                             '-c', '322', '341', '547', '1167',
+                             '--realizations', '6', '--seed', '1',
+                             '-o', tmp_path / 'rep.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert stderr == ''
+    assert sorted(os.listdir(tmp_path)) == [f'rep_{i}.swc' for i in range(6)]
+    proc = subprocess.Popen(['swc', 'repair', 'pass_nmo_2_cut.swc',
+                             '-c', '322', '341', '547', '1167',
+                             '--realizations', '6', '--keep', '2', '--seed', '1',
+                             '-o', tmp_path / 'best{}.swc'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stderr == ''
+    lines = [x.split() for x in stdout.splitlines()]
+    assert len(lines) == 2
+    assert float(lines[0][1]) <= float(lines[1][1])
+    for name, _ in lines:
+        index = os.path.basename(name)[4:-4]
+        assert np.array_equal(np.loadtxt(name), np.loadtxt(tmp_path / f'rep_{index}.swc'))
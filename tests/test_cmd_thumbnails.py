@@ -0,0 +1,42 @@
+"""Testing CLI command thumbnails."""
+
+import os
+import subprocess
+
+import matplotlib.image as mpimg
+
+
+def test_thumbnails(tmp_path):
+    """Tests for images of several files, skipping failed files."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    files = ['pass_simple_branch.swc', 'pass_nmo_1.swc', 'fail_not_array_1.swc']
+    proc = subprocess.Popen(['swc', 'thumbnails', *files, '--size', '64',
+                             '-o', tmp_path / 'img' / '{name}.png'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 1
+    assert stdout == ''
+    assert stderr.startswith('fail_not_array_1.swc: ')
+    assert sorted(os.listdir(tmp_path / 'img')) == ['pass_nmo_1.png',
+                                                   'pass_simple_branch.png']
+    assert mpimg.imread(tmp_path / 'img' / 'pass_nmo_1.png').shape[:2] == (64, 64)
+
+
+def test_montage(tmp_path):
+    """Tests for grid montages in fixed projection."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    files = ['pass_simple_branch.swc', 'pass_simple_branch_2.swc', 'pass_nmo_1.swc']
+    proc = subprocess.Popen(['swc', 'thumbnails', *files, '-j', 'xz',
+                             '-g', '1', '2', '--size', '50', '--label', '-v',
+                             '-o', tmp_path / '{name}.png'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert len(stderr.splitlines()) == 2
+    assert sorted(os.listdir(tmp_path)) == ['montage_1.png', 'montage_2.png']
+    assert mpimg.imread(tmp_path / 'montage_1.png').shape[:2] == (50, 100)
@@ -94,3 +94,19 @@ def test_proj_yz(tmp_path):
     assert proc.returncode == 0
     assert stdout == ''
     assert stderr == ''
+
+
+def test_single_line(tmp_path):
+    """Tests for plot with NaN-separated lines."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    proc = subprocess.Popen(['swc', 'view', 'pass_simple_branch.swc',
+                             'pass_simple_branch.swc',
+                             '--single-line', '-c', 'shadow',
+                             '-o', tmp_path / 'test_treem.png'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0
+    assert stdout == ''
+    assert stderr == ''
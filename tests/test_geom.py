@@ -7,11 +7,16 @@ from numpy.testing import assert_array_almost_equal
 
 from treem import Morph
 from treem.utils.geom import (
+    SpatialHash,
+    convex_hull,
     fibonacci_sphere,
+    principal_extents,
     repair_branch,
     rotation,
     rotation_matrix,
     sample,
+    sample_blocks,
+    voxelize,
 )
 
 
@@ -67,6 +72,66 @@ def test_sample():
     assert np.allclose(result_sample, expected_sample)
 
 
+def test_sample_blocks():
+    """Tests interpolation of several polylines at once."""
+    points = np.array([[0, 0, 0, 1],
+                       [3, 0, 0, 1],
+                       [0, 0, 0, 2],
+                       [0, 1, 0, 2],
+                       [0, 1, 1, 4]])
+    result_sample = sample_blocks(points, np.array([0, 2]), np.array([4, 3]))
+    assert np.allclose(result_sample[:4], sample(points[:2], 4))
+    assert np.allclose(result_sample[4:], [[0, 0, 0, 2], [0, 1, 0, 2], [0, 1, 1, 4]])
+
+
+def test_voxelize():
+    """Tests for voxelize."""
+    starts = np.array([[0, 0, 0], [1, 1, 1], [-3, 2, 7]])
+    ends = np.array([[25, 0, 0], [4, 2, 3], [12, -9, 21]])
+    voxels, lengths = voxelize(starts, ends, 10.0)
+    assert voxels.tolist()[:3] == [[0, 0, 0], [1, 0, 0], [2, 0, 0]]
+    assert_array_almost_equal(lengths[:3], [10, 10, 5])
+    assert np.isclose(lengths.sum(), np.linalg.norm(ends - starts, axis=1).sum())
+
+
+def test_spatial_hash():
+    """Tests for SpatialHash."""
+    space = SpatialHash(1.0)
+    space.add(np.array([[0.5, 0.5, 0.5]]), np.array([[4.5, 0.5, 0.5]]))
+    assert len(space.cells) == 5
+    starts, ends = np.array([[2.5, -2.5, 0.5]]), np.array([[2.5, 2.5, 0.5]])
+    assert space.count(starts, ends) == 1
+    assert space.count(starts, ends, center=[2.5, 1.5, 0.5]) == 0
+    assert space.count(starts + [0, 0, 2], ends + [0, 0, 2]) == 0
+
+
+def test_convex_hull():
+    """Tests for convex_hull."""
+    cube = np.array([[x, y, z] for x in (0, 2) for y in (0, 2) for z in (0, 2)])
+    inner = np.random.default_rng(0).uniform(0, 2, (100, 3))
+    area, volume = convex_hull(np.vstack([inner, cube]))
+    assert np.isclose(area, 24)
+    assert np.isclose(volume, 8)
+    assert convex_hull(cube[:4]) == (0, 0)
+
+
+def test_convex_hull_sphere():
+    """Tests for convex_hull with all points on the hull."""
+    points = fibonacci_sphere(2000)
+    inner = 0.5 * np.random.default_rng(0).uniform(-1, 1, (1000, 3))
+    area, volume = convex_hull(np.vstack([points, inner]))
+    assert np.isclose(area, 4 * np.pi, rtol=1e-2)
+    assert np.isclose(volume, 4 / 3 * np.pi, rtol=1e-2)
+    assert np.allclose(convex_hull(points + [10, 20, 30]), (area, volume))
+
+
+def test_principal_extents():
+    """Tests for principal_extents."""
+    points = np.array([[0, 0, 0], [3, 4, 0], [1, 1, 1], [1, 1, 3]])
+    extents = principal_extents(points, np.array([0, 0, 2, 2]), 3)
+    assert_array_almost_equal(extents, [[5, 0, 0], [0, 0, 0], [2, 0, 0]])
+
+
 def test_repair_branch():
     """Tests repair_branch."""
     os.chdir(os.path.dirname(__file__) + '/data')
@@ -89,3 +154,25 @@ def test_repair_branch_short():
     res = repair_branch(cmorph, cut, rmorph, rep, keep_radii=True)
     assert res == 1
     assert [node.ident() for node in cmorph.root.walk()] == list(range(1, 17))
+
+
+def test_repair_branch_reject():
+    """Tests repair_branch, candidate rejected."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    cmorph = Morph('pass_simple_branch.swc')
+    rmorph = Morph('pass_simple_branch_2.swc')
+    cut = cmorph.node(13)
+    rep = rmorph.node(12)
+    data = cmorph.data.copy()
+    placed = []
+
+    def accept(tree):
+        placed.append(tree)
+        return False
+
+    res = repair_branch(cmorph, cut, rmorph, rep, accept=accept)
+    assert res == 0
+    assert len(placed) == 1
+    assert len(placed[0].data) > 1
+    assert np.array_equal(cmorph.data, data)
+    assert [node.ident() for node in cmorph.root.walk()] == list(range(1, 14))
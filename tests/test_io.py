@@ -5,7 +5,7 @@ import json
 import numpy as np
 import pytest
 
-from treem.io import TreemEncoder, load_swc, save_swc
+from treem.io import TreemEncoder, load_swc, save_swc, variant_name
 
 
 class MyObject:
@@ -54,3 +54,10 @@ def test_load_swc_content(tmp_path):
     loaded_data = load_swc(target_file)
     assert loaded_data.shape == SWC_DATA.shape
     np.testing.assert_array_almost_equal(loaded_data, SWC_DATA)
+
+
+def test_variant_name():
+    """Tests output file names of several outputs."""
+    assert variant_name('mod.swc', 3, 12) == 'mod_03.swc'
+    assert variant_name('out/rep.swc', 0, 1) == 'out/rep_0.swc'
+    assert variant_name('rep{:03d}.swc', 7, 12) == 'rep007.swc'
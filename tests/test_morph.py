@@ -1,8 +1,21 @@
 """Testing module morph."""
 
+import os
+
 import numpy as np
 
-from treem import SWC, DGram, Morph, Node, get_segdata
+from treem import (
+    SEC,
+    SWC,
+    DGram,
+    Morph,
+    Node,
+    get_barcode,
+    get_path,
+    get_secdata,
+    get_sections,
+    get_segdata,
+)
 
 
 def test_node_str():
@@ -87,6 +100,22 @@ def test_move_node():
     assert morph.data.tolist() == [[1, 1, 0, 0, 0, 1, -1], [2, 3, 2, 1, 1, 1, 1]]
 
 
+def test_rotate_branch():
+    """Tests rotation of branches, contiguous or not in the data."""
+    morph = Morph(data=np.array([[1, 1, 0, 0, 0, 1, -1],
+                                 [2, 3, 1, 0, 0, 1, 1],
+                                 [3, 3, 0, 1, 0, 1, 1],
+                                 [4, 3, 2, 0, 0, 1, 2],
+                                 [5, 3, 0, 2, 0, 1, 3]], dtype=float))
+    assert morph.branch(morph.root) == slice(0, 5)
+    assert morph.branch(morph.node(2)).tolist() == [1, 3]
+    morph.rotate([0, 0, 1], np.pi / 2, morph.node(2))
+    assert np.allclose(morph.data[:, SWC.XYZ], [[0, 0, 0], [1, 0, 0], [0, 1, 0],
+                                                [1, 1, 0], [0, 2, 0]])
+    morph.translate([0, 0, 1], morph.node(3))
+    assert np.allclose(morph.data[:, SWC.Z], [0, 0, 1, 0, 1])
+
+
 def test_node_area():
     """Tests node area."""
     morph = Morph(data=np.array([[1, 1, 0, 0, 0, 1, -1], [2, 3, 1, 0, 0, 1, 1]]))
@@ -177,6 +206,78 @@ def test_segdata_branching():
     assert np.allclose(get_segdata(morph), data)
 
 
+def test_secdata():
+    """Tests for section morphometric data."""
+    morph = Morph(data=np.array([[1, 1, 0, 0, 0, 1, -1],
+                                 [2, 3, 1, 0, 0, 1, 1],
+                                 [3, 3, 2, 0, 0, 1, 2],
+                                 [4, 3, 1, 2, 0, 1, 2]]))
+    pi = np.pi
+    data = [[1, 1, 1, 0, 2, 0, np.nan, 0, 0, 2, 0, 0, 0, 0, 0, 0, 0],
+            [2, 3, 2, 1, 2, 1, 1, 2 * pi, pi, 2, 1, 1, 0, 0, 0, 0, 1],
+            [3, 3, 0, 2, 1, 1, 1, 2 * pi, pi, 2, 2, 2, 0, 0, 0, 0, 2],
+            [4, 3, 0, 2, 1, 2, 1, 4 * pi, 2 * pi, 2, 1, 1, 2, 2, 0, 0, 2.23606798]]
+    assert np.allclose(get_secdata(morph), data, equal_nan=True)
+
+
+def test_secdata_breadth_first():
+    """Tests for section data of non depth-first ordered data."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    morph = Morph('pass_breadth_first.swc')
+    first, last, _, degree, order, breadth, secid = get_sections(morph)
+    assert first.tolist() == [0, 1, 3, 4, 8, 9]
+    assert last.tolist() == [0, 2, 10, 6, 11, 12]
+    assert secid.tolist() == [0, 1, 1, 2, 3, 2, 3, 2, 4, 5, 2, 4, 5]
+    assert breadth.tolist() == [3, 3, 1, 2, 1, 1]
+    secdata = get_secdata(morph)
+    expected = get_secdata(Morph('pass_simple_branch.swc'))
+    assert np.allclose(secdata[:, SEC.T:], expected[:, SEC.T:], equal_nan=True)
+
+
+def test_path():
+    """Tests for path distances of all nodes."""
+    morph = Morph(data=np.array([[1, 1, 0, 0, 0, 1, -1],
+                                 [2, 3, 1, 0, 0, 1, 1],
+                                 [3, 3, 2, 0, 0, 1, 2],
+                                 [4, 3, 1, 2, 0, 1, 2],
+                                 [5, 3, 1, 3, 0, 1, 4]]))
+    path = [node.path() for node in morph.nodes]
+    assert np.allclose(get_path(morph), path)
+    assert np.allclose(get_path(morph), [0, 1, 2, 3, 4])
+
+
+def test_path_breadth_first():
+    """Tests for path distances of non depth-first ordered data."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    morph = Morph('pass_breadth_first.swc')
+    path = [node.path() for node in morph.nodes]
+    assert np.allclose(get_path(morph), path)
+
+
+def test_barcode():
+    """Tests for persistence barcode."""
+    morph = Morph(data=np.array([[1, 1, 0, 0, 0, 1, -1],
+                                 [2, 3, 1, 0, 0, 1, 1],
+                                 [3, 3, 2, 0, 0, 1, 2],
+                                 [4, 3, 1, 2, 0, 1, 2],
+                                 [5, 3, 1, 3, 0, 1, 4]]))
+    bars, types = get_barcode(morph, get_path(morph))
+    assert bars.tolist() == [[2, 1], [4, 0]]
+    assert types.tolist() == [3, 3]
+
+
+def test_barcode_breadth_first():
+    """Tests for persistence barcode of non depth-first ordered data."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    morph = Morph('pass_breadth_first.swc')
+    bars, types = get_barcode(morph, get_path(morph))
+    expected = Morph('pass_simple_branch.swc')
+    expected_bars, expected_types = get_barcode(expected, get_path(expected))
+    assert sorted(bars.tolist()) == sorted(expected_bars.tolist())
+    assert len(bars) == 3
+    assert types.tolist() == expected_types.tolist()
+
+
 def test_dgram_init():
     """Tests for dendrogram initialization."""
     morph = Morph(data=np.array([[1, 1, 0, 0, 0, 1, -1],
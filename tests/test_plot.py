@@ -3,9 +3,16 @@
 import os
 
 import matplotlib.pyplot as plt
+import numpy as np
 
-from treem import Morph
-from treem.utils.plot import plot_neuron, plot_points, plot_section
+from treem import SWC, Morph
+from treem.utils.plot import (
+    plot_neuron,
+    plot_points,
+    plot_projection,
+    plot_section,
+    plot_tree,
+)
 
 
 def test_plot_neuron(tmp_path):
@@ -17,6 +24,56 @@ def test_plot_neuron(tmp_path):
     plot_neuron(ax, morph)
 
 
+def test_plot_neuron_batched(tmp_path):
+    """Tests plot_neuron with one artist per color."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    morph = Morph('pass_nmo_1.swc')
+    neurites = np.count_nonzero(morph.data[:, SWC.T] != SWC.SOMA)
+    types = {stem.type() for stem in morph.stems()}
+    xyz = morph.data[:, SWC.XYZ]
+    for single_line in (False, True):
+        fig = plt.figure()
+        ax = fig.add_subplot(projection='3d')
+        plot_neuron(ax, morph, single_line=single_line)
+        fig.canvas.draw()
+        if single_line:
+            assert len(ax.lines) == len(types) + 2
+            assert sum(len(x.get_data_3d()[0]) for x in ax.lines[:-2]) == 3 * neurites
+        else:
+            assert len(ax.collections) == len(types)
+            assert sum(len(x.get_segments()) for x in ax.collections) == neurites
+        assert np.allclose(ax.xy_dataLim.min, xyz[:, :2].min(axis=0))
+        assert np.allclose(ax.xy_dataLim.max, xyz[:, :2].max(axis=0))
+        assert np.isclose(ax.zz_dataLim.xmin, xyz[:, 2].min())
+        assert np.isclose(ax.zz_dataLim.xmax, xyz[:, 2].max())
+        plt.close(fig)
+
+
+def test_plot_projection(tmp_path):
+    """Tests plot_projection."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    fig = plt.figure()
+    ax = fig.add_subplot()
+    morph = Morph('pass_nmo_1.swc')
+    plot_projection(ax, morph, 'yz')
+    yz = morph.data[:, SWC.YZ]
+    assert np.allclose(ax.dataLim.min, yz.min(axis=0))
+    assert np.allclose(ax.dataLim.max, yz.max(axis=0))
+    plt.close(fig)
+
+
+def test_plot_tree(tmp_path):
+    """Tests plot_tree."""
+    os.chdir(os.path.dirname(__file__) + '/data')
+    fig = plt.figure()
+    ax = fig.add_subplot(projection='3d')
+    morph = Morph('pass_simple_branch.swc')
+    node = morph.root.siblings[0]
+    plot_tree(ax, node, morph.data, c='C5', linewidth=2)
+    fig.canvas.draw()
+    assert len(ax.collections[0].get_segments()) == sum(1 for _ in node.walk()) - 1
+
+
 def test_plot_points(tmp_path):
     """Tests plot_points."""
     os.chdir(os.path.dirname(__file__) + '/data')
@@ -0,0 +1,56 @@
+"""Testing module stats."""
+
+import numpy as np
+
+from treem.utils.stats import Histogram, OnlineStats, P2Quantile, persistence_images
+
+
+def test_online_stats():
+    """Tests running mean and standard deviation."""
+    data = np.random.default_rng(1).normal(5, 2, 1000)
+    stats = OnlineStats()
+    for x in data:
+        stats.add(x)
+    stats.add(np.nan)
+    assert stats.count == 1000
+    assert np.isclose(stats.mean, data.mean())
+    assert np.isclose(stats.std(), data.std(ddof=1))
+    assert stats.min == data.min()
+    assert stats.max == data.max()
+
+
+def test_p2_quantile():
+    """Tests P-square quantile estimate."""
+    data = np.random.default_rng(1).exponential(3, 5000)
+    quantile = P2Quantile(0.5)
+    for x in data[:3]:
+        quantile.add(x)
+    assert np.isclose(quantile.value(), np.median(data[:3]))
+    for x in data[3:]:
+        quantile.add(x)
+    assert abs(quantile.value() - np.median(data)) < 0.05
+
+
+def test_histogram():
+    """Tests histogram with doubling range."""
+    data = np.random.default_rng(1).uniform(-10, 10, 1000)
+    hist = Histogram(bins=8)
+    for x in data:
+        hist.add(x)
+    edges = hist.edges()
+    counts, _ = np.histogram(data, bins=edges)
+    assert len(edges) == 9
+    assert edges[0] <= data.min()
+    assert edges[-1] > data.max()
+    assert sum(hist.hist()) == len(data)
+    assert np.allclose(hist.hist(), counts, atol=1)
+
+
+def test_persistence_images():
+    """Tests persistence images of several barcodes."""
+    bars = np.array([[10, 0], [5, 2], [8, 0]])
+    images = persistence_images(bars, [0, 0, 2], 3, (0, 10), bins=11)
+    assert images.shape == (3, 11, 11)
+    assert images[0].max() == images[2].max() == 1
+    assert not images[1].any()
+    assert np.unravel_index(images[2].argmax(), (11, 11)) == (8, 0)
@@ -5,11 +5,16 @@ import sys
 from importlib.metadata import PackageNotFoundError, version
 
 from treem.commands.check import check
+from treem.commands.compare import compare
 from treem.commands.convert import convert
+from treem.commands.density import density
 from treem.commands.find import find
-from treem.commands.measure import measure
+from treem.commands.measure import FEATURES, OPTIONAL, measure
 from treem.commands.modify import modify
+from treem.commands.pipeline import pipeline
+from treem.commands.pool import build
 from treem.commands.repair import repair
+from treem.commands.thumbnails import thumbnails
 from treem.commands.view import view
 from treem.io import SWC
 
@@ -32,6 +37,16 @@ FLOAT = '<float>'
 TYPE_ALL = 'point type {1,2,3,4} [all]'
 TYPE_ANY = 'point type {1,2,3,4} [any]'
 
+
+def _feature_list(text):
+    """Parses comma-separated list of morphometric features."""
+    names = text.split(',')
+    unknown = set(names).difference(FEATURES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f'invalid feature: {", ".join(sorted(unknown))}')
+    return names
+
+
 def cli():
     """Command-line interface definition."""
     parser = argparse.ArgumentParser()
@@ -98,6 +113,8 @@ def cli():
     cmd_view.add_argument('--line-width', dest='linewidth',
                           metavar=FLOAT, type=float, default=1.0,
                           help='line width [1.0]')
+    cmd_view.add_argument('--single-line', dest='single_line', action='store_true',
+                          help='draw neurites as NaN-separated lines')
     cmd_view.add_argument('--set-color', dest='cycler_color', nargs='+',
                           metavar=STR, type=str,
                           help='set color (number:colorname)')
@@ -129,6 +146,37 @@ def cli():
                           help='save image to file')
     cmd_view.set_defaults(func=view)
 
+    cmd_thumbnails = subparsers.add_parser(
+        'thumbnails', epilog='output template {name} is the input name or montage_<n> '
+                             'with -g; returns the number of failed files',
+        help='render preview images')
+    cmd_thumbnails.add_argument(
+        '--version', action='version',
+        version=f'swc {__version__}',
+        help="Show the version number and exit"
+    )
+    cmd_thumbnails.add_argument('file', type=str, nargs='+', help=FILE)
+    cmd_thumbnails.add_argument('-p', dest='type', metavar=INT, type=int,
+                                nargs='+', choices=SWC.TYPES, help=TYPE_ALL)
+    cmd_thumbnails.add_argument('-j', dest='proj', metavar=STR, type=str,
+                                choices=['xy', 'xz', 'yz'],
+                                help='projection {xy,xz,yz} [3d]')
+    cmd_thumbnails.add_argument('-g', dest='grid', metavar=INT, type=int, nargs=2,
+                                help='montage grid (rows, columns)')
+    cmd_thumbnails.add_argument('--size', dest='size', metavar=INT, type=int,
+                                default=256, help='image size per cell, px [256]')
+    cmd_thumbnails.add_argument('--line-width', dest='linewidth',
+                                metavar=FLOAT, type=float, default=0.5,
+                                help='line width [0.5]')
+    cmd_thumbnails.add_argument('--label', dest='label', action='store_true',
+                                help='show file names')
+    cmd_thumbnails.add_argument('-o', dest='out', metavar=STR, type=str,
+                                default='{name}.png',
+                                help='output image template [{name}.png]')
+    cmd_thumbnails.add_argument('-v', dest='verbose', action='store_true',
+                                help='show progress')
+    cmd_thumbnails.set_defaults(func=thumbnails)
+
     cmd_find = subparsers.add_parser('find', epilog='prints out point ids',
                                      help='locate single points')
     cmd_find.add_argument(
@@ -214,6 +262,9 @@ def cli():
                             help='swap two random branches (from the list supplied to -i)')
     cmd_modify.add_argument('--seed', dest='seed', metavar=INT, type=int,
                             help='random seed')
+    cmd_modify.add_argument('--variants', dest='variants', metavar=INT, type=int,
+                            help='number of variants, saved as mod_<index>.swc '
+                                 'or by template, e.g. -o var{:03d}.swc')
     cmd_modify.add_argument('-o', dest='out', metavar=STR, type=str,
                             default='mod.swc',
                             help='output morphology file (swc) [mod.swc]')
@@ -225,7 +276,7 @@ def cli():
         version=f'swc {__version__}',
         help="Show the version number and exit"
     )
-    cmd_repair.add_argument('file', type=str, help=FILE)
+    cmd_repair.add_argument('file', type=str, nargs='?', help=FILE)
     cmd_repair.add_argument('-n', dest='center', action='store_true',
                             help='center root')
     cmd_repair.add_argument('-t', dest='translate', metavar=FLOAT,
@@ -253,6 +304,12 @@ def cli():
                             choices=set(SWC.TYPES).difference((SWC.SOMA,)),
                             default=SWC.DEND,
                             help='point type of a branch to graft onto a soma node {2,3,4} [3]')
+    cmd_repair.add_argument('--collision', dest='collision', metavar=FLOAT, type=float,
+                            help='reject repaired branches crossing other neurites, '
+                                 'grid cell size, um')
+    cmd_repair.add_argument('--collision-retries', dest='collision_retries', metavar=INT,
+                            type=int, default=10,
+                            help='number of candidate branches per cut point [10]')
     cmd_repair.add_argument('--del-branch', dest='del_branch',
                             action='store_true',
                             help='delete cut branches before repair')
@@ -271,7 +328,8 @@ def cli():
                             type=float, default=1.0,
                             help='diameter value, um [1.0]')
     cmd_repair.add_argument('--pool', dest='pool', metavar=STR, type=str,
-                            nargs='+', help='reference reconstructions for repair')
+                            nargs='+', help='reference reconstructions for repair '
+                                            'or branch library (see swc pool build)')
     cmd_repair.add_argument('-l', dest='delete', metavar=INT, type=int,
                             nargs='+',
                             help='delete nodes in points ids (not compatible with -c)')
@@ -286,14 +344,65 @@ def cli():
                             choices=['x', 'y', 'z'], help='flip along axis {x,y,z}')
     cmd_repair.add_argument('-r', dest='res', metavar=FLOAT, type=float,
                             help='sampling resolution, um')
+    cmd_repair.add_argument('--realizations', dest='realizations', metavar=INT, type=int,
+                            help='number of repair realizations, saved as rep_<index>.swc '
+                                 'or by template, e.g. -o rep{:03d}.swc')
+    cmd_repair.add_argument('--keep', dest='keep', metavar=INT, type=int,
+                            help='save realizations with the least overlap of added '
+                                 'and intact neurites only')
+    cmd_repair.add_argument('--manifest', dest='manifest', metavar=STR, type=str,
+                            help='repair files listed in manifest with per-file '
+                                 'point ids (json), in parallel')
     cmd_repair.add_argument('-o', dest='out', metavar=STR, type=str,
                             default='rep.swc',
-                            help='output morphology file (swc) [rep.swc]')
+                            help='output morphology file (swc) [rep.swc], '
+                                 'prefixed by input name or template {name} with --manifest')
     cmd_repair.add_argument('-v', dest='verbose', action='store_true',
                             help='verbose output')
     cmd_repair.set_defaults(func=repair)
 
-    cmd_measure = subparsers.add_parser('measure', help='measure morphology')
+    cmd_pipeline = subparsers.add_parser(
+        'pipeline', epilog='spec lists steps as {"repair": "<options>"} or '
+                           '{"modify": "<options>"} without --variants, --realizations, '
+                           '--keep, --manifest; returns the number of errors',
+        help='apply repair and modify steps from spec file')
+    cmd_pipeline.add_argument(
+        '--version', action='version',
+        version=f'swc {__version__}',
+        help="Show the version number and exit"
+    )
+    cmd_pipeline.add_argument('spec', type=str,
+                              help='pipeline spec file (json, yaml)')
+    cmd_pipeline.add_argument('file', type=str, nargs='+', help=FILE)
+    cmd_pipeline.add_argument('-o', dest='out', metavar=STR, type=str,
+                              default='{name}_pip.swc',
+                              help='output file template (swc) [{name}_pip.swc]')
+    cmd_pipeline.add_argument('--timings', dest='timings', metavar=STR, type=str,
+                              help='save step timings to file (json)')
+    cmd_pipeline.add_argument('-v', dest='verbose', action='store_true',
+                              help='show progress and step timings')
+    cmd_pipeline.set_defaults(func=pipeline,
+                              parsers={'modify': cmd_modify, 'repair': cmd_repair})
+
+    cmd_pool = subparsers.add_parser('pool', help='manage reference reconstructions')
+    cmd_pool.add_argument(
+        '--version', action='version',
+        version=f'swc {__version__}',
+        help="Show the version number and exit"
+    )
+    pool_actions = cmd_pool.add_subparsers(dest='action', required=True)
+    cmd_pool_build = pool_actions.add_parser(
+        'build', epilog='returns the number of failed files',
+        help='build library of intact branches for repair --pool')
+    cmd_pool_build.add_argument('file', type=str, nargs='+', help=FILE)
+    cmd_pool_build.add_argument('-o', dest='out', metavar=STR, type=str,
+                                default='pool.lib',
+                                help='output library directory [pool.lib]')
+    cmd_pool_build.set_defaults(func=build)
+
+    cmd_measure = subparsers.add_parser(
+        'measure', epilog=f'features: {", ".join(FEATURES)}',
+        help='measure morphology')
     cmd_measure.add_argument(
         '--version', action='version',
         version=f'swc {__version__}',
@@ -303,18 +412,83 @@ def cli():
     cmd_measure.add_argument('-p', dest='type', metavar=INT, type=int,
                              nargs='+', choices=SWC.TYPES, help=TYPE_ALL)
     cmd_measure.add_argument('-a', dest='opt', metavar=STR, type=str,
-                             nargs='+', choices=['path', 'sec', 'seg', 'sholl'],
-                             help='optional feature {path,sec,seg,sholl}')
+                             nargs='+', choices=OPTIONAL,
+                             help=f'optional feature {{{",".join(OPTIONAL)}}}')
+    cmd_measure.add_argument('--features', dest='features', metavar=STR,
+                             type=_feature_list,
+                             help='compute selected features only, comma-separated [all]')
     cmd_measure.add_argument('--sholl-res', dest='sholl_res', metavar=FLOAT,
-                             type=float, default=10.0,
+                             type=float, nargs='+', default=[10.0],
                              help='sholl sampling resolution, um [10.0]')
     cmd_measure.add_argument('--sholl-proj', dest='sholl_proj', metavar=STR,
-                             type=str, choices=['xy', 'xz', 'yz'],
-                             help='sholl projection {xy,xz,yz} [3d]')
+                             type=str, nargs='+', choices=['xy', 'xz', 'yz', '3d'],
+                             default=['3d'],
+                             help='sholl projection {xy,xz,yz,3d} [3d]')
+    cmd_measure.add_argument('--tmd-filt', dest='tmd_filt', metavar=STR,
+                             type=str, choices=['radial', 'path'], default='radial',
+                             help='tmd filtration {radial,path} [radial]')
     cmd_measure.add_argument('-o', dest='out', metavar=STR, type=str,
-                             help='output morphometric file (json)')
+                             help='output morphometric file (json, jsonl, csv) '
+                                  'or directory of columns (npy, trailing /)')
+    cmd_measure.add_argument('--summary', dest='summary', metavar=STR, type=str,
+                             nargs='?', const='-',
+                             help='population statistics, print or save to file (json)')
+    cmd_measure.add_argument('-v', dest='verbose', action='store_true',
+                             help='show progress')
     cmd_measure.set_defaults(func=measure)
 
+    cmd_compare = subparsers.add_parser(
+        'compare', epilog='input is the columnar output of swc measure (npy); '
+                          'rows and columns of the matrix follow its cell index',
+        help='compute pairwise distances between morphologies')
+    cmd_compare.add_argument(
+        '--version', action='version',
+        version=f'swc {__version__}',
+        help="Show the version number and exit"
+    )
+    cmd_compare.add_argument('file', type=str,
+                             help='input morphometric directory (npy columns)')
+    cmd_compare.add_argument('-p', dest='type', metavar=INT, type=int,
+                             nargs='+', choices=SWC.TYPES, help=TYPE_ALL)
+    cmd_compare.add_argument('-m', dest='mode', metavar=STR, type=str,
+                             choices=['features', 'sholl', 'tmd'], default='features',
+                             help='compare {features,sholl,tmd} [features]')
+    cmd_compare.add_argument('--sholl', dest='sholl', metavar=STR, type=str,
+                             help='sholl feature, e.g. sholl_xy_10, '
+                                  'if measured at several resolutions or projections')
+    cmd_compare.add_argument('-d', dest='metric', metavar=STR, type=str,
+                             choices=['euclidean', 'cityblock', 'cosine'],
+                             default='euclidean',
+                             help='distance {euclidean,cityblock,cosine} [euclidean]')
+    cmd_compare.add_argument('-o', dest='out', metavar=STR, type=str,
+                             default='dist.npy',
+                             help='output distance matrix (npy) [dist.npy]')
+    cmd_compare.set_defaults(func=compare)
+
+    cmd_density = subparsers.add_parser(
+        'density', epilog='prints out grid origin, shape and voxel size; '
+                          'returns the number of failed files',
+        help='compute neurite length density')
+    cmd_density.add_argument(
+        '--version', action='version',
+        version=f'swc {__version__}',
+        help="Show the version number and exit"
+    )
+    cmd_density.add_argument('file', type=str, nargs='+', help=FILE)
+    cmd_density.add_argument('-p', dest='type', metavar=INT, type=int,
+                             nargs='+', choices=SWC.TYPES,
+                             help='point type {1,2,3,4} [2,3,4]')
+    cmd_density.add_argument('-r', dest='res', metavar=FLOAT, type=float,
+                             default=10.0,
+                             help='voxel size, um [10.0]')
+    cmd_density.add_argument('-b', dest='bounds', metavar=FLOAT, type=float,
+                             nargs=6,
+                             help='grid bounds: xmin xmax ymin ymax zmin zmax [auto]')
+    cmd_density.add_argument('-o', dest='out', metavar=STR, type=str,
+                             default='density.npy',
+                             help='output density volume (npy) [density.npy]')
+    cmd_density.set_defaults(func=density)
+
     cmd_convert = subparsers.add_parser('convert', help='convert input file')
     cmd_convert.add_argument(
         '--version', action='version',
@@ -0,0 +1,139 @@
+"""Implementation of CLI compare command."""
+
+import functools
+import itertools
+import multiprocessing as mp
+
+import numpy as np
+
+from treem import SWC
+from treem.commands.measure import load_columns
+
+_BLOCK = 1024
+
+_COLUMNS = ('sec_', 'seg_', 'sholl', 'tmd_')
+
+_vectors = None
+
+
+def _feature_vectors(data, types, args):
+    """Returns standardized scalar features per reconstruction and point type."""
+    ncell = len(data['name'])
+    names = [x for x in data.files if x not in ('name', 'cell', 'type')
+             and not x.startswith(_COLUMNS)]
+    vectors = np.full((ncell, len(types), len(names)), np.nan)
+    for index, point_type in enumerate(types):
+        rows = data['type'] == point_type
+        for col, name in enumerate(names):
+            vectors[data['cell'][rows], index, col] = data[name][rows]
+    vectors = vectors.reshape(ncell, -1)
+    vectors = vectors[:, ~np.all(np.isnan(vectors), axis=0)]
+    std = np.nanstd(vectors, axis=0)
+    std[std == 0] = 1.0
+    vectors = (vectors - np.nanmean(vectors, axis=0)) / std
+    return np.nan_to_num(vectors)
+
+
+def _sholl_vectors(data, types, args):
+    """Returns Sholl profiles per reconstruction and point type on common radii.
+
+    With several resolutions or projections in the data, the Sholl
+    feature must be chosen.
+    """
+    ncell = len(data['name'])
+    prefixes = sorted(x[:-6] for x in data.files
+                      if x.startswith('sholl') and x.endswith('_radii'))
+    if not prefixes:
+        raise KeyError('no sholl data')
+    if args.sholl:
+        if args.sholl not in prefixes:
+            raise ValueError(f'no sholl feature {args.sholl}, '
+                             f'choose from {", ".join(prefixes)}')
+        prefix = args.sholl
+    elif len(prefixes) > 1:
+        raise ValueError('several sholl features, '
+                         f'choose with --sholl from {", ".join(prefixes)}')
+    else:
+        prefix = prefixes[0]
+    radii = data[f'{prefix}_radii']
+    circles = np.unique(radii)
+    vectors = np.zeros((ncell, len(types), len(circles)))
+    point_types = data[f'{prefix}_type']
+    for index, point_type in enumerate(types):
+        sel = point_types == point_type
+        np.add.at(vectors, (data[f'{prefix}_cell'][sel], index,
+                            np.searchsorted(circles, radii[sel])),
+                  data[f'{prefix}_crossings'][sel])
+    return vectors.reshape(ncell, -1)
+
+
+def _tmd_vectors(data, types, args):
+    """Returns persistence images per reconstruction and point type."""
+    ncell = len(data['name'])
+    if 'tmd_image' not in data.files:
+        raise KeyError('no tmd data')
+    images = data['tmd_image'].reshape(len(data['cell']), -1)
+    vectors = np.zeros((ncell, len(types), images.shape[1]))
+    for index, point_type in enumerate(types):
+        rows = data['type'] == point_type
+        vectors[data['cell'][rows], index] = images[rows]
+    return vectors.reshape(ncell, -1)
+
+
+_VECTORS = {'features': _feature_vectors, 'sholl': _sholl_vectors, 'tmd': _tmd_vectors}
+
+
+def _init_worker(vectors):
+    """Shares vectors with the worker process."""
+    global _vectors
+    _vectors = vectors
+
+
+def _get_block(block, metric):
+    """Computes distances between two blocks of vectors."""
+    rows, cols = block
+    a, b = _vectors[rows], _vectors[cols]
+    if metric == 'cityblock':
+        step = max(1, 2**22 // max(1, b.size))
+        dist = np.concatenate([np.abs(a[i:i + step, np.newaxis] - b).sum(axis=2)
+                               for i in range(0, len(a), step)])
+    else:
+        if metric == 'cosine':
+            a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+            b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+            dist = 1.0 - a @ b.T
+        else:
+            sq = (a * a).sum(axis=1)[:, np.newaxis] + (b * b).sum(axis=1) - 2 * a @ b.T
+            dist = np.sqrt(np.maximum(sq, 0.0))
+        if rows == cols:
+            np.fill_diagonal(dist, 0.0)
+    return rows, cols, dist
+
+
+def compare(args):
+    """Computes pairwise distances between reconstructions.
+
+    Reconstructions are described by vectors of scalar features, Sholl
+    profiles or persistence images, read from the columnar output of
+    measure (directory of npy files, memory-mapped). Distances are computed in square blocks of the
+    upper triangle in parallel and written to a memory-mapped file
+    (npy), rows and columns follow the cell index of the input.
+    """
+    types = args.type if args.type else SWC.TYPES
+    try:
+        vectors = _VECTORS[args.mode](load_columns(args.file), sorted(set(types)), args)
+    except (OSError, ValueError, KeyError) as err:
+        print(f'cannot compare {args.file}: {err}.')
+        return 1
+    size = len(vectors)
+    blocks = [slice(x, min(x + _BLOCK, size)) for x in range(0, size, _BLOCK)]
+    tasks = itertools.combinations_with_replacement(blocks, 2)
+    func = functools.partial(_get_block, metric=args.metric)
+    dist = np.lib.format.open_memmap(args.out, mode='w+', dtype=np.float32,
+                                     shape=(size, size))
+    with mp.Pool(initializer=_init_worker, initargs=(vectors,)) as pool:
+        for rows, cols, block in pool.imap_unordered(func, tasks):
+            dist[rows, cols] = block
+            dist[cols, rows] = block.T
+    dist.flush()
+    return 0
@@ -0,0 +1,90 @@
+"""Implementation of CLI density command."""
+
+import functools
+import multiprocessing as mp
+import sys
+
+import numpy as np
+
+from treem import SWC, Morph
+from treem.morph import get_parents
+from treem.utils.geom import voxelize
+
+
+def _sparse_sum(voxels, values):
+    """Sums values of identical voxels."""
+    if not len(voxels):
+        return np.zeros((0, 3), dtype=int), np.zeros(0)
+    voxels, index = np.unique(voxels, axis=0, return_inverse=True)
+    return voxels, np.bincount(index.ravel(), weights=values)
+
+
+def _get_density(reconstructions, types, res):
+    """Computes partial density grid of a group of reconstructions.
+
+    Returns:
+        voxel indices, lengths and errors of failed files.
+    """
+    voxels, lengths, errors = [], [], []
+    for reconstruction in reconstructions:
+        try:
+            morph = Morph(reconstruction)
+        except Exception as err:
+            errors.append(f'{reconstruction}: {type(err).__name__}: {err}, skipped')
+            continue
+        parents = get_parents(morph)
+        coords = morph.data[:, SWC.XYZ]
+        mask = np.isin(morph.data[:, SWC.T], types)
+        mask[0] = False
+        vox, length = voxelize(coords[parents[mask]], coords[mask], res)
+        voxels.append(vox)
+        lengths.append(length)
+    if not voxels:
+        return np.zeros((0, 3), dtype=int), np.zeros(0), errors
+    return (*_sparse_sum(np.concatenate(voxels), np.concatenate(lengths)), errors)
+
+
+def density(args):
+    """Computes neurite length density of multiple reconstructions.
+
+    Segments are split at voxel boundaries, lengths are summed in
+    partial grids of the worker processes and reduced. The volume is
+    written to a memory-mapped file (npy) in x, y, z index order.
+
+    Returns:
+        number of failed reconstructions.
+    """
+    types = args.type if args.type else (SWC.AXON, SWC.DEND, SWC.APIC)
+    reconstructions = args.file
+    nchunks = min(len(reconstructions), 4 * mp.cpu_count())
+    chunks = [chunk.tolist() for chunk in np.array_split(reconstructions, nchunks)]
+    func = functools.partial(_get_density, types=types, res=args.res)
+    err = 0
+    voxels, lengths = [], []
+    with mp.Pool() as pool:
+        for vox, length, errors in pool.imap_unordered(func, chunks):
+            for error in errors:
+                print(error, file=sys.stderr)
+            err += len(errors)
+            voxels.append(vox)
+            lengths.append(length)
+    voxels, lengths = _sparse_sum(np.concatenate(voxels), np.concatenate(lengths))
+    if args.bounds:
+        bounds = np.array(args.bounds).reshape(3, 2) / args.res
+        origin = np.floor(bounds[:, 0]).astype(int)
+        shape = np.ceil(bounds[:, 1]).astype(int) - origin
+        inside = np.all((voxels >= origin) & (voxels < origin + shape), axis=1)
+        voxels, lengths = voxels[inside], lengths[inside]
+    elif len(voxels):
+        origin = voxels.min(axis=0)
+        shape = voxels.max(axis=0) - origin + 1
+    else:
+        origin, shape = np.zeros(3, dtype=int), np.zeros(3, dtype=int)
+    grid = np.lib.format.open_memmap(args.out, mode='w+', dtype=np.float32,
+                                     shape=tuple(shape.tolist()))
+    grid[tuple((voxels - origin).T)] = lengths
+    grid.flush()
+    print(f'origin: {" ".join(f"{x:g}" for x in origin * args.res)}')
+    print(f'shape: {" ".join(str(x) for x in shape)}')
+    print(f'voxel: {args.res:g}')
+    return err
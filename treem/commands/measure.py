@@ -1,212 +1,582 @@
 """Implementation of CLI measure command."""
 
+import collections
+import contextlib
+import csv
+import functools
 import json
 import math
 import multiprocessing as mp
 import os
+import sys
 
 import numpy as np
 
 from treem import SWC, Morph
 from treem.io import TreemEncoder
-from treem.morph import SEG, get_segdata
-from treem.utils.geom import norm
-
-
-def _measure_neurites(morph, morphometry, name, types, ptmap, opt=[]):
-    """Computes morphometry of non-soma nodes."""
-    center = morph.root.coord()
-    if 'seg' in opt:
-        segdata = get_segdata(morph)
-    for point_type in set(types).difference((SWC.SOMA,)):
-        mdata = []
-        for sec in filter(lambda x: x[0].type() == point_type,
-                          morph.root.sections()):
-            head = sec[0]
-            tail = sec[-1]
-            seclen = morph.length(sec)
-            chord = norm(tail.coord() - head.parent.coord())
-            coords = morph.coords(sec)
-            xmin, ymin, zmin = np.min(coords, axis=0)
-            xmax, ymax, zmax = np.max(coords, axis=0)
-            dist = np.max(np.linalg.norm(coords - center, axis=1))
-            mdata.append(
-                [tail.degree(), head.order(), tail.breadth(),
-                 seclen, chord / seclen,
-                 morph.area(sec), morph.volume(sec),
-                 morph.radii(sec).mean() * 2,
-                 xmin, xmax, ymin, ymax, zmin, zmax,
-                 dist])
-        if mdata:
-            ndata = np.array(mdata)
-            d = morphometry[name][ptmap[point_type]] = {}
-            d['degree'] = np.max(ndata[:, 0], axis=0).astype(int)
-            d['order'] = np.max(ndata[:, 1], axis=0).astype(int)
-            d['breadth'] = np.max(ndata[:, 2], axis=0).astype(int)
-            d['nbranch'] = sum(1 for x in ndata[:, 0] if x > 1)
-            d['nterm'] = sum(1 for x in ndata[:, 0] if x == 0)
-            d['nstem'] = sum(1 for x in ndata[:, 1] if x == 1)
-            d['length'] = np.sum(ndata[:, 3], axis=0)
-            d['seclen'] = np.mean(ndata[:, 3], axis=0)
-            d['contrac'] = np.mean(ndata[:, 4], axis=0)
-            d['area'] = np.sum(ndata[:, 5], axis=0)
-            d['volume'] = np.sum(ndata[:, 6], axis=0)
-            d['diam'] = np.mean(ndata[:, 7], axis=0)
-            d['xdim'] = (np.max(ndata[:, 9], axis=0) - np.min(ndata[:, 8], axis=0))
-            d['ydim'] = (np.max(ndata[:, 11], axis=0) - np.min(ndata[:, 10], axis=0))
-            d['zdim'] = (np.max(ndata[:, 13], axis=0) - np.min(ndata[:, 12], axis=0))
-            d['dist'] = np.max(ndata[:, 14], axis=0)
-            if 'sec' in opt:
-                d['_sec'] = ndata.transpose()
-            if 'seg' in opt:
-                sel = np.nonzero(segdata[:, SEG.T] == point_type)
-                d['_seg'] = segdata[sel]
-
-
-def _measure_soma(morph, morphometry, name, types, ptmap):
-    """Computes morphometry of soma nodes."""
-    for point_type in set(types).intersection((SWC.SOMA,)):
-        mdata = []
-        for sec in filter(lambda x: x[0].type() == point_type,
-                          morph.root.sections()):
-            if len(sec) > 1:
-                area = morph.area(sec)
-                volume = morph.volume(sec)
-            else:
-                area = 4 * math.pi * sec[0].radius()**2
-                volume = 4 / 3 * math.pi * sec[0].radius()**3
-            mdata.append([area, volume, morph.radii(sec).mean() * 2])
-        if mdata:
-            ndata = np.array(mdata)
-            d = morphometry[name][ptmap[point_type]] = {}
-            d['area'] = np.sum(ndata[:, 0], axis=0)
-            d['volume'] = np.sum(ndata[:, 1], axis=0)
-            d['diam'] = np.mean(ndata[:, 2], axis=0)
-            d['xroot'], d['yroot'], d['zroot'] = morph.root.coord()
-
-
-def _measure_path(morph, morphometry, name, types, ptmap):
-    """Computes path distance for non-soma nodes."""
-    path = {}
-    for node in morph.root.leaves():
-        point_type = node.type()
-        if point_type in set(types).difference((SWC.SOMA,)):
-            if point_type not in path:
-                path[point_type] = []
-            path_length = sum(x.length() for x in node.walk(reverse=True))
-            path[point_type].append(path_length)
-    for point_type in path:
-        d = morphometry[name][ptmap[point_type]]
-        d['path'] = max(path[point_type])
-
-
-def _get_sholl_center(morph, sholl_proj):
-    """Finds center of reconstruction for given projection."""
-    if sholl_proj == 'xy':
-        center = morph.root.v[SWC.XY]
-    elif sholl_proj == 'xz':
-        center = morph.root.v[SWC.XZ]
-    elif sholl_proj == 'yz':
-        center = morph.root.v[SWC.YZ]
-    else:
-        center = morph.root.coord()
-    return center
-
-
-def _get_sholl_segment(node, sholl_proj):
-    """Locates Sholl segment."""
-    if sholl_proj == 'xy':
-        c1 = node.parent.v[SWC.XY]
-        c2 = node.v[SWC.XY]
-    elif sholl_proj == 'xz':
-        c1 = node.parent.v[SWC.XZ]
-        c2 = node.v[SWC.XZ]
-    elif sholl_proj == 'yz':
-        c1 = node.parent.v[SWC.YZ]
-        c2 = node.v[SWC.YZ]
-    else:
-        c1 = node.parent.coord()
-        c2 = node.coord()
-    return c1, c2
+from treem.morph import (
+    SEC,
+    SEG,
+    get_barcode,
+    get_parents,
+    get_path,
+    get_secdata,
+    get_sections,
+    get_segdata,
+    get_segments,
+)
+from treem.utils.geom import convex_hull, principal_extents
+from treem.utils.stats import OnlineStats, persistence_images
+
+PTNAMES = ('soma', 'axon', 'dend', 'apic')
+SEC_COLS = ('degree', 'order', 'breadth', 'length', 'contrac', 'area', 'volume',
+            'diam', 'xmin', 'xmax', 'ymin', 'ymax', 'zmin', 'zmax', 'dist')
+SEG_COLS = ('id', 'type', 'x', 'y', 'z', 'r', 'parent', 'length', 'path', 'xsec',
+            'xsec_rel', 'dist', 'degree', 'order', 'breadth', 'totlen')
+
+
+def _get_soma(morph, args):
+    """Collects area, volume and diameter of soma sections."""
+    mdata = []
+    for sec in filter(lambda x: x[0].type() == SWC.SOMA,
+                      morph.root.sections()):
+        if len(sec) > 1:
+            area = morph.area(sec)
+            volume = morph.volume(sec)
+        else:
+            area = 4 * math.pi * sec[0].radius()**2
+            volume = 4 / 3 * math.pi * sec[0].radius()**3
+        mdata.append([area, volume, morph.radii(sec).mean() * 2])
+    return np.reshape(mdata, (-1, 3))
+
+
+def _get_leaf_path(morph, args, parents, path):
+    """Returns maximal path distance of terminals per point type."""
+    leaves = np.bincount(parents[1:], minlength=len(parents)) == 0
+    types = morph.data[leaves, SWC.T].astype(int)
+    return {t: np.max(path[leaves][types == t]) for t in set(types.tolist())}
+
+
+def _get_sections(morph, args, sectable):
+    """Returns section topology in order of Morph.root.sections()."""
+    first, _, preorder, degree, order, breadth, _ = sectable
+    return {'type': morph.data[first[preorder], SWC.T].astype(int),
+            'degree': degree[preorder],
+            'order': order[preorder],
+            'breadth': breadth[preorder]}
+
+
+def _get_secsum(values, sectable):
+    """Sums segment values per section in order of Morph.root.sections()."""
+    first, preorder, secid = sectable[0], sectable[2], sectable[6]
+    return np.bincount(secid, weights=values, minlength=len(first))[preorder]
+
+
+_TMD_BINS = 50
+_TMD_BLOCK = 1024
+
+_SHOLL_PROJ = {'xy': SWC.XY, 'xz': SWC.XZ, 'yz': SWC.YZ, '3d': SWC.XYZ}
+
+
+def _get_sholl_dist(morph, sholl_proj):
+    """Computes distances of segment ends to the root for given projection."""
+    coords = morph.data[:, _SHOLL_PROJ[sholl_proj]]
+    dist = np.linalg.norm(coords - coords[0], axis=1)
+    return dist[get_parents(morph)], dist
 
 
 def _collect_sholl_data(morph, types, sholl_res, sholl_proj):
-    """Collects data needed to calcuate Sholl intersections."""
-    c0 = _get_sholl_center(morph, sholl_proj)
+    """Collects Sholl intersections for all resolutions and projections.
+
+    Circle indices of the segment ends are computed for all segments at
+    once, intersections are counted from the difference array.
+
+    Returns:
+        dict of intersections {(proj, res): {point_type: (circles, counts)}}.
+    """
+    point_types = morph.data[:, SWC.T].astype(int)
+    point_types[0] = SWC.SOMA
     selected_types = set(types).difference((SWC.SOMA,))
     sholl_data = {}
-    for node in morph.root.walk():
-        point_type = node.type()
-        if point_type in selected_types:
-            if point_type not in sholl_data:
-                sholl_data[point_type] = {}
-            c1, c2 = _get_sholl_segment(node, sholl_proj)
-            n1 = math.ceil(np.linalg.norm(c1 - c0) / sholl_res)
-            n2 = math.ceil(np.linalg.norm(c2 - c0) / sholl_res)
-            for circle in range(n1, n2):
-                if circle not in sholl_data[point_type]:
-                    sholl_data[point_type][circle] = 0
-                sholl_data[point_type][circle] += 1
+    for proj in sholl_proj:
+        dist1, dist2 = _get_sholl_dist(morph, proj)
+        for res in sholl_res:
+            n1 = np.ceil(dist1 / res).astype(int)
+            n2 = np.ceil(dist2 / res).astype(int)
+            outward = n2 > n1
+            data = sholl_data[(proj, res)] = {}
+            for point_type in selected_types:
+                sel = outward & (point_types == point_type)
+                if sel.any():
+                    size = n2[sel].max() + 1
+                    diff = (np.bincount(n1[sel], minlength=size)
+                            - np.bincount(n2[sel], minlength=size))
+                    counts = np.cumsum(diff)
+                    circles = np.nonzero(counts)[0]
+                    data[point_type] = (circles, counts[circles])
     return sholl_data
 
 
-def _measure_sholl(morph, morphometry, name, types, ptmap, sholl_res, sholl_proj):
-    """Computes Sholl intersections."""
-    sholl_data = _collect_sholl_data(morph, types, sholl_res, sholl_proj)
-    for point_type in sholl_data:
-        radii = [x * sholl_res for x in sholl_data[point_type]]
-        cross = [sholl_data[point_type][x] for x in sholl_data[point_type]]
-        d = morphometry[name][ptmap[point_type]]
-        d['sholl'] = {'radii': radii, 'crossings': cross}
+def _get_sholl(morph, args):
+    """Collects Sholl intersections for requested resolutions and projections."""
+    types = args.type if args.type else SWC.TYPES
+    sholl_res = np.atleast_1d(args.sholl_res)
+    sholl_proj = np.atleast_1d(args.sholl_proj or '3d')
+    return _collect_sholl_data(morph, types, sholl_res, sholl_proj)
+
+
+def _sholl_features(sholl_data, point_type):
+    """Returns Sholl profiles of the point type."""
+    features = {}
+    for (proj, res), data in sholl_data.items():
+        feature = 'sholl' if len(sholl_data) == 1 else f'sholl_{proj}_{res:g}'
+        if point_type in data:
+            circles, counts = data[point_type]
+            features[feature] = {'radii': circles * res, 'crossings': counts}
+    return features
+
+
+def _get_barcode(morph, args, parents, sectable, path):
+    """Computes persistence barcode with radial or path distance filtration."""
+    if args.tmd_filt == 'path':
+        values = path
+    else:
+        coords = morph.data[:, SWC.XYZ]
+        values = np.linalg.norm(coords - coords[0], axis=1)
+    return get_barcode(morph, values, parents, sectable)
+
+
+def _tmd_features(barcode, point_type):
+    """Returns persistence barcode of the point type."""
+    bars, types = barcode
+    bars = bars[types == point_type]
+    return {'tmd': {'birth': bars[:, 0], 'death': bars[:, 1]}}
+
+
+def _get_hull(morph, args):
+    """Computes convex hull area and volume per neurite type."""
+    point_types = morph.data[1:, SWC.T].astype(int)
+    coords = morph.data[1:, SWC.XYZ]
+    return {t: convex_hull(coords[point_types == t])
+            for t in set(point_types.tolist()).difference((SWC.SOMA,))}
+
+
+def _get_extents(morph, args):
+    """Computes extents along principal axes of all point types at once."""
+    point_types = morph.data[1:, SWC.T].astype(int)
+    return principal_extents(morph.data[1:, SWC.XYZ], point_types, max(SWC.TYPES) + 1)
+
+
+# Intermediate data: name -> (required intermediates, function).
+# Functions are called as func(morph, args, *required).
+INTERMEDIATES = {
+    'parents': ((), lambda m, a: get_parents(m)),
+    'segments': (('parents',), lambda m, a, p: get_segments(m, p)),
+    'sectable': (('parents',), lambda m, a, p: get_sections(m, p)),
+    'sections': (('sectable',), _get_sections),
+    'seclen': (('segments', 'sectable'), lambda m, a, s, t: _get_secsum(s[0], t)),
+    'secarea': (('segments', 'sectable'), lambda m, a, s, t: _get_secsum(s[1], t)),
+    'secvolume': (('segments', 'sectable'), lambda m, a, s, t: _get_secsum(s[2], t)),
+    'secdata': (('parents', 'sectable', 'segments'),
+                lambda m, a, p, t, s: get_secdata(m, p, t, s)),
+    'segdata': ((), lambda m, a: get_segdata(m)),
+    'path': (('parents', 'segments'), lambda m, a, p, s: get_path(m, p, length=s[0])),
+    'leafpath': (('parents', 'path'), _get_leaf_path),
+    'sholl': ((), _get_sholl),
+    'barcode': (('parents', 'sectable', 'path'), _get_barcode),
+    'soma': ((), _get_soma),
+    'hull': ((), _get_hull),
+    'extents': ((), _get_extents),
+}
+
+# Features: name -> (required intermediates, function).
+# Functions are called as func(morph, point_type, sel, *required), where
+# sel selects sections of the point type; dict values add several features.
+NEURITE_FEATURES = {
+    'degree': (('sections',), lambda m, t, sel, x: np.max(x['degree'][sel]).astype(int)),
+    'order': (('sections',), lambda m, t, sel, x: np.max(x['order'][sel]).astype(int)),
+    'breadth': (('sections',), lambda m, t, sel, x: np.max(x['breadth'][sel]).astype(int)),
+    'nbranch': (('sections',), lambda m, t, sel, x: np.count_nonzero(x['degree'][sel] > 1)),
+    'nterm': (('sections',), lambda m, t, sel, x: np.count_nonzero(x['degree'][sel] == 0)),
+    'nstem': (('sections',), lambda m, t, sel, x: np.count_nonzero(x['order'][sel] == 1)),
+    'length': (('seclen',), lambda m, t, sel, x: np.sum(x[sel])),
+    'seclen': (('seclen',), lambda m, t, sel, x: np.mean(x[sel])),
+    'contrac': (('secdata',), lambda m, t, sel, x: np.mean(x[sel, SEC.CONTRAC])),
+    'area': (('secarea',), lambda m, t, sel, x: np.sum(x[sel])),
+    'volume': (('secvolume',), lambda m, t, sel, x: np.sum(x[sel])),
+    'diam': (('secdata',), lambda m, t, sel, x: np.mean(x[sel, SEC.DIAM])),
+    'xdim': (('secdata',), lambda m, t, sel, x: np.max(x[sel, SEC.XMAX]) - np.min(x[sel, SEC.XMIN])),
+    'ydim': (('secdata',), lambda m, t, sel, x: np.max(x[sel, SEC.YMAX]) - np.min(x[sel, SEC.YMIN])),
+    'zdim': (('secdata',), lambda m, t, sel, x: np.max(x[sel, SEC.ZMAX]) - np.min(x[sel, SEC.ZMIN])),
+    'dist': (('secdata',), lambda m, t, sel, x: np.max(x[sel, SEC.DIST])),
+    'path': (('leafpath',), lambda m, t, sel, x: x.get(t)),
+    'sholl': (('sholl',), lambda m, t, sel, x: _sholl_features(x, t)),
+    'hull': (('hull',), lambda m, t, sel, x: dict(zip(('hullarea', 'hullvolume'), x[t]))),
+    'pca': (('extents',), lambda m, t, sel, x: dict(zip(('pdim1', 'pdim2', 'pdim3'), x[t]))),
+    'tmd': (('barcode',), lambda m, t, sel, x: _tmd_features(x, t)),
+    'sec': (('secdata',), lambda m, t, sel, x: {'_sec': x[sel, SEC.DEGREE:].transpose()}),
+    'seg': (('segdata',), lambda m, t, sel, x: {'_seg': x[x[:, SEG.T] == t]}),
+}
+
+SOMA_FEATURES = {
+    'area': (('soma',), lambda m, t, sel, x: np.sum(x[:, 0])),
+    'volume': (('soma',), lambda m, t, sel, x: np.sum(x[:, 1])),
+    'diam': (('soma',), lambda m, t, sel, x: np.mean(x[:, 2])),
+    'xroot': ((), lambda m, t, sel: m.root.coord()[0]),
+    'yroot': ((), lambda m, t, sel: m.root.coord()[1]),
+    'zroot': ((), lambda m, t, sel: m.root.coord()[2]),
+}
+
+OPTIONAL = ('hull', 'path', 'pca', 'sec', 'seg', 'sholl', 'tmd')
+FEATURES = sorted(set(NEURITE_FEATURES).union(SOMA_FEATURES))
+STANDARD = [x for x in FEATURES if x not in OPTIONAL]
+
+
+class _Intermediates():
+    """Lazily computed intermediate data shared by features."""
+
+    def __init__(self, morph, args):
+        self.morph = morph
+        self.args = args
+        self.cache = {}
+
+    def __getitem__(self, key):
+        """Returns intermediate data, computes it with requirements if needed."""
+        if key not in self.cache:
+            requires, func = INTERMEDIATES[key]
+            self.cache[key] = func(self.morph, self.args, *(self[x] for x in requires))
+        return self.cache[key]
+
+
+def _get_features(args):
+    """Returns names of requested features."""
+    opt = args.opt if args.opt else []
+    features = args.features if args.features else STANDARD
+    return list(dict.fromkeys(list(features) + opt))
 
 
 def get_morphometry(reconstruction, args):
-    """Computes morphometric features of a reconstruction."""
+    """Computes morphometric features of a reconstruction.
+
+    Only the intermediate data needed by the requested features are
+    computed, intermediates are shared between features.
+    """
     types = args.type if args.type else SWC.TYPES
-    ptmap = dict(zip(SWC.TYPES, ['soma', 'axon', 'dend', 'apic']))
+    ptmap = dict(zip(SWC.TYPES, PTNAMES))
     morphometry = {}
 
     morph = Morph(reconstruction)
     name = os.path.splitext(os.path.basename(reconstruction))[0]
     morphometry[name] = {}
 
-    opt = args.opt if args.opt else []
-    _measure_neurites(morph, morphometry, name, types, ptmap, opt=opt)
-    _measure_soma(morph, morphometry, name, types, ptmap)
-
-    if 'path' in opt:
-        _measure_path(morph, morphometry, name, types, ptmap)
-    if 'sholl' in opt:
-        _measure_sholl(morph, morphometry, name, types, ptmap, sholl_res=args.sholl_res, sholl_proj=args.sholl_proj)
+    features = _get_features(args)
+    inter = _Intermediates(morph, args)
+    for point_type in sorted(set(types)):
+        registry = SOMA_FEATURES if point_type == SWC.SOMA else NEURITE_FEATURES
+        names = [x for x in features if x in registry]
+        if not names:
+            continue
+        if point_type == SWC.SOMA:
+            sel = None
+            present = len(inter['soma']) > 0
+        else:
+            sel = inter['sections']['type'] == point_type
+            present = sel.any()
+        if present:
+            d = morphometry[name][ptmap[point_type]] = {}
+            for feature in names:
+                requires, func = registry[feature]
+                value = func(morph, point_type, sel, *(inter[x] for x in requires))
+                if isinstance(value, dict):
+                    d.update(value)
+                elif value is not None:
+                    d[feature] = value
 
     return morphometry
 
 
+def _get_morphometry_safe(reconstruction, args):
+    """Computes morphometric features, catches errors of a single file."""
+    try:
+        return reconstruction, get_morphometry(reconstruction, args), None
+    except Exception as err:
+        return reconstruction, None, f'{type(err).__name__}: {err}'
+
+
+def _iter_features(metric, name):
+    """Iterates scalar features (Sholl as the total number of crossings)."""
+    for point_type in sorted(metric[name]):
+        for feature in sorted(metric[name][point_type]):
+            value = metric[name][point_type][feature]
+            if feature.startswith('sholl'):
+                yield point_type, feature, sum(value['crossings'])
+            elif feature not in ('_sec', '_seg', 'tmd'):
+                yield point_type, feature, value
+
+
 def _print_metrics(metric):
     """Handles console printing."""
     for name in metric:
         print(name)
-        for point_type in sorted(metric[name]):
-            for feature in sorted(metric[name][point_type]):
-                if feature not in ('sholl', '_sec', '_seg'):
-                    print(f'{point_type} {feature:10s} '
-                          f'{metric[name][point_type][feature]:>8g}')
-                elif feature == 'sholl':
-                    print(f'{point_type} {feature:10s} '
-                          f'{sum(metric[name][point_type][feature]["crossings"]):>8g}')
+        for point_type, feature, value in _iter_features(metric, name):
+            print(f'{point_type} {feature:10s} {value:>8g}')
         print()
 
 
+def _get_format(out):
+    """Returns output format by file extension {json,jsonl,csv} or npy for directory."""
+    if out.endswith(('/', os.sep)) or os.path.isdir(out):
+        return 'npy'
+    ext = os.path.splitext(out)[1].lower()
+    return ext[1:] if ext in ('.jsonl', '.csv') else 'json'
+
+
+def _write_header(file, fmt):
+    """Starts output file."""
+    if fmt == 'json':
+        file.write('{')
+    elif fmt == 'csv':
+        csv.writer(file).writerow(['name', 'type', 'feature', 'value'])
+
+
+def _write_metrics(file, fmt, metric, count):
+    """Appends morphometry of a single reconstruction to output file."""
+    for name in metric:
+        if fmt == 'jsonl':
+            record = {name: metric[name]}
+            file.write(json.dumps(record, sort_keys=True, cls=TreemEncoder) + '\n')
+        elif fmt == 'csv':
+            writer = csv.writer(file)
+            for point_type, feature, value in _iter_features(metric, name):
+                writer.writerow([name, point_type, feature, f'{value:g}'])
+        else:
+            text = json.dumps(metric[name], indent=4, sort_keys=True, cls=TreemEncoder)
+            text = text.replace('\n', '\n    ')
+            sep = ',' if count else ''
+            file.write(f'{sep}\n    {json.dumps(name)}: {text}')
+
+
+def _write_footer(file, fmt):
+    """Finalizes output file."""
+    if fmt == 'json':
+        file.write('\n}\n')
+
+
+class ColumnWriter():
+    """Writes columns of measurements to a directory of npy files.
+
+    Values are appended to raw files as soon as they are available, on
+    close every column is copied to a memory-mapped npy file, so that
+    columns are never held in memory as a whole. Only the cell names
+    are kept until close. Scalar features missing in a row are NaN,
+    persistence barcodes are converted to persistence images of all
+    reconstructions on a common grid (tmd_grid) on close.
+    """
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.names = []
+        self.rows = 0
+        self.columns = {}
+        self.scalars = []
+
+    def append(self, key, values):
+        """Appends values to a column (dtype is set by the first values)."""
+        if key not in self.columns:
+            values = np.asarray(values)
+            file = open(os.path.join(self.path, f'{key}.tmp'), 'wb')
+            self.columns[key] = [file, values.dtype, 0]
+        column = self.columns[key]
+        values = np.asarray(values, dtype=column[1])
+        values.tofile(column[0])
+        column[2] += values.size
+
+    def append_row(self, cell, point_type, scalars):
+        """Appends scalar features of a reconstruction and point type."""
+        for feature in sorted(set(scalars).difference(self.scalars)):
+            self.scalars.append(feature)
+            self.append(feature, np.full(self.rows, np.nan))
+        for feature in self.scalars:
+            self.append(feature, [scalars.get(feature, np.nan)])
+        self.append('cell', [cell])
+        self.append('type', [point_type])
+        self.rows += 1
+
+    def _save(self, key, file, dtype, size):
+        """Copies raw column data to npy file."""
+        file.close()
+        source = os.path.join(self.path, f'{key}.tmp')
+        target = np.lib.format.open_memmap(os.path.join(self.path, f'{key}.npy'),
+                                           mode='w+', dtype=dtype, shape=(size,))
+        if size:
+            target[:] = np.memmap(source, dtype=dtype, mode='r', shape=(size,))
+        target.flush()
+        del target
+        os.remove(source)
+
+    def _save_images(self):
+        """Computes persistence images in blocks of rows."""
+        birth, death, rows = (load_columns(self.path)[x]
+                              for x in ('tmd_birth', 'tmd_death', 'tmd_row'))
+        bounds = (0.0, float(np.max(birth, initial=0.0)))
+        np.save(os.path.join(self.path, 'tmd_grid.npy'), np.linspace(*bounds, _TMD_BINS))
+        images = np.lib.format.open_memmap(os.path.join(self.path, 'tmd_image.npy'),
+                                           mode='w+', dtype=float,
+                                           shape=(self.rows, _TMD_BINS, _TMD_BINS))
+        for lo in range(0, self.rows, _TMD_BLOCK):
+            hi = min(lo + _TMD_BLOCK, self.rows)
+            start, stop = np.searchsorted(rows, [lo, hi])
+            bars = np.column_stack([birth[start:stop], death[start:stop]])
+            images[lo:hi] = persistence_images(bars, rows[start:stop] - lo, hi - lo,
+                                               bounds, _TMD_BINS)
+        images.flush()
+
+    def close(self):
+        """Finalizes all columns."""
+        for key in ('cell', 'type'):
+            if key not in self.columns:
+                self.append(key, np.zeros(0, dtype=int))
+        for key, (file, dtype, size) in self.columns.items():
+            self._save(key, file, dtype, size)
+        np.save(os.path.join(self.path, 'name.npy'), np.array(self.names, dtype=str))
+        if 'tmd_row' in self.columns:
+            self._save_images()
+
+
+class Columns():
+    """Columns of measurements in a directory of npy files (see ColumnWriter)."""
+
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            raise OSError(f'not a directory: {path}')
+        self.path = path
+        self.files = sorted(os.path.splitext(x)[0] for x in os.listdir(path)
+                            if x.endswith('.npy'))
+
+    def __getitem__(self, key):
+        """Returns memory-mapped column."""
+        if key not in self.files:
+            raise KeyError(key)
+        return np.load(os.path.join(self.path, f'{key}.npy'), mmap_mode='r')
+
+
+def load_columns(path):
+    """Opens columnar output of measure (directory of npy files)."""
+    return Columns(path)
+
+
+def _write_columns(writer, metric, cell):
+    """Appends morphometry of a single reconstruction to columnar output.
+
+    Scalar features are stored in rows per reconstruction and point type
+    (index columns ``cell`` and ``type``), section, segment, Sholl and
+    barcode data are stored as per-feature columns with their own index
+    columns.
+    """
+    ptmap = dict(zip(PTNAMES, SWC.TYPES))
+    for name in metric:
+        writer.names.append(name)
+        for ptname in sorted(metric[name]):
+            point_type = ptmap[ptname]
+            scalars = {}
+            for feature, value in metric[name][ptname].items():
+                if feature == '_sec':
+                    writer.append('sec_cell', np.full(value.shape[1], cell))
+                    writer.append('sec_type', np.full(value.shape[1], point_type))
+                    for col, label in enumerate(SEC_COLS):
+                        writer.append(f'sec_{label}', value[col])
+                elif feature == '_seg':
+                    writer.append('seg_cell', np.full(len(value), cell))
+                    for col, label in enumerate(SEG_COLS):
+                        writer.append(f'seg_{label}', value[:, col])
+                elif feature.startswith('sholl'):
+                    size = len(value['radii'])
+                    writer.append(f'{feature}_cell', np.full(size, cell))
+                    writer.append(f'{feature}_type', np.full(size, point_type))
+                    writer.append(f'{feature}_radii', np.asarray(value['radii'], dtype=float))
+                    writer.append(f'{feature}_crossings', value['crossings'])
+                elif feature == 'tmd':
+                    writer.append('tmd_row', np.full(len(value['birth']), writer.rows))
+                    writer.append('tmd_birth', np.asarray(value['birth'], dtype=float))
+                    writer.append('tmd_death', np.asarray(value['death'], dtype=float))
+                else:
+                    scalars[feature] = value
+            writer.append_row(cell, point_type, scalars)
+
+
+def _update_summary(summary, metric):
+    """Updates population statistics per point type and feature."""
+    for name in metric:
+        for point_type, feature, value in _iter_features(metric, name):
+            summary[(point_type, feature)].add(value)
+
+
+def _save_summary(summary, out):
+    """Prints population statistics or writes them to file (json)."""
+    if out == '-':
+        print('type feature      count       mean        std        min'
+              '        q25        q50        q75        max')
+        for point_type, feature in sorted(summary):
+            stats = summary[(point_type, feature)].summary()
+            values = ' '.join(f'{stats[x]:>10g}' for x in
+                              ('mean', 'std', 'min', 'q25', 'q50', 'q75', 'max'))
+            print(f'{point_type} {feature:10s} {stats["count"]:>6d} {values}')
+    else:
+        stats = {}
+        for point_type, feature in sorted(summary):
+            stats.setdefault(point_type, {})[feature] = summary[(point_type, feature)].summary()
+        with open(out, 'w', encoding='utf-8') as file:
+            json.dump(stats, file, indent=4, sort_keys=True, cls=TreemEncoder)
+
+
 def measure(args):
-    """Computes morphometric features of multiple reconstructions."""
-    metric = {}
+    """Computes morphometric features of multiple reconstructions.
+
+    Results are written (or printed) as soon as they are available,
+    reconstructions that cannot be measured are reported and skipped.
+    Population statistics of scalar features are accumulated online if
+    requested, console output of single reconstructions is then omitted.
+
+    Returns:
+        number of failed reconstructions.
+    """
     reconstructions = args.file
-    items = zip(reconstructions, (args,) * len(reconstructions))
-    with mp.Pool() as pool:
-        for morphometry in pool.starmap(get_morphometry, items):
-            metric.update(morphometry)
-    if args.out:
-        with open(args.out, 'w', encoding='utf-8') as file:
-            json.dump(metric, file, indent=4, sort_keys=True, cls=TreemEncoder)
-    else:
-        _print_metrics(metric)
+    total = len(reconstructions)
+    chunksize = max(1, total // (4 * mp.cpu_count()))
+    func = functools.partial(_get_morphometry_safe, args=args)
+    fmt = _get_format(args.out) if args.out else None
+    err = 0
+    count = 0
+    summary = collections.defaultdict(OnlineStats)
+    with contextlib.ExitStack() as stack:
+        if fmt == 'npy':
+            file = ColumnWriter(args.out)
+            stack.callback(file.close)
+        elif args.out:
+            file = stack.enter_context(open(args.out, 'w', encoding='utf-8', newline=''))
+            _write_header(file, fmt)
+        pool = stack.enter_context(mp.Pool())
+        for done, (reconstruction, morphometry, error) in enumerate(
+                pool.imap_unordered(func, reconstructions, chunksize), 1):
+            if args.verbose:
+                print(f'[{done}/{total}] {reconstruction}', file=sys.stderr)
+            if error:
+                print(f'{reconstruction}: {error}, skipped', file=sys.stderr)
+                err += 1
+                continue
+            if args.summary:
+                _update_summary(summary, morphometry)
+            if fmt == 'npy':
+                _write_columns(file, morphometry, count)
+                count += 1
+            elif args.out:
+                _write_metrics(file, fmt, morphometry, count)
+                count += 1
+            elif not args.summary:
+                _print_metrics(morphometry)
+        if args.out and fmt != 'npy':
+            _write_footer(file, fmt)
+    if args.summary:
+        _save_summary(summary, args.summary)
+    return err
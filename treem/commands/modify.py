@@ -1,13 +1,15 @@
 """Implementation of CLI modify command."""
 
+import functools
 import math
+import multiprocessing as mp
 from itertools import chain
 
 import numpy as np
 
-from treem.io import SWC
-from treem.morph import Morph
-from treem.utils.geom import rotation
+from treem.io import SWC, variant_name
+from treem.morph import Morph, get_blocks, get_parents, get_sections
+from treem.utils.geom import rotation, rotation_matrix
 
 
 def _scale_radii(morph, nodes, scale_radius):
@@ -35,85 +37,197 @@ def _scale_coords(morph, nodes, scale_coords):
             morph.translate(shift, child)
 
 
+def _section_blocks(nodes, sections):
+    """Returns head, tail and section indices of the blocks starting at nodes.
+
+    Heads and tails are positions into the node permutation of the
+    section blocks (see get_blocks).
+    """
+    last, secid = sections[1], sections[6]
+    perm = get_blocks(sections)[0]
+    pos = np.argsort(perm)
+    index = np.array([node.ident() - 1 for node in nodes], dtype=int)
+    secs = secid[index]
+    return perm, pos[index], pos[last[secs]], secs
+
+
+def _select_blocks(morph, nodes, minsize):
+    """Returns section table and blocks (head to section tail) of minimal size."""
+    parents = get_parents(morph)
+    sections = get_sections(morph, parents)
+    perm, heads, tails, secs = _section_blocks(nodes, sections)
+    keep = tails - heads + 1 >= minsize
+    return parents, sections, perm, heads[keep], tails[keep], secs[keep]
+
+
+def _block_batches(secs):
+    """Splits blocks into batches with at most one block per section."""
+    order = np.argsort(secs, kind='stable')
+    start = np.flatnonzero(np.diff(secs[order], prepend=-1))
+    rank = np.empty(len(secs), dtype=int)
+    rank[order] = np.arange(len(secs)) - np.repeat(start, np.diff(np.append(start, len(secs))))
+    return [np.flatnonzero(rank == x) for x in range(rank.max(initial=-1) + 1)]
+
+
+def _block_index(heads, tails):
+    """Returns indices, block ids and block offsets of contiguous blocks."""
+    size = tails - heads + 1
+    offset = np.cumsum(size) - size
+    index = np.arange(size.sum()) - np.repeat(offset - heads, size)
+    return index, np.repeat(np.arange(len(size)), size), offset
+
+
+def _block_lengths(points, block, offset):
+    """Returns lengths of the blocks without the head segments."""
+    seglen = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    seglen[offset[1:] - 1] = 0.0
+    return np.bincount(block[1:], weights=seglen, minlength=len(offset))
+
+
+def _fit_blocks(points, head, length, block, offset):
+    """Rescales blocks to given lengths and puts them back at the heads."""
+    scale = length / _block_lengths(points, block, offset)
+    return head[block] + scale[block, np.newaxis] * (points - points[offset][block])
+
+
+def _translate_children(morph, parents, sections, secs, shifts):
+    """Shifts branches at the section tails, accumulated downstream."""
+    first, secid = sections[0], sections[6]
+    sec_parents = secid[parents[first]].tolist()
+    tail_shift = np.zeros((len(first), 3))
+    tail_shift[secs] = shifts
+    total = np.zeros((len(first), 3))
+    for sec, parent in enumerate(sec_parents[1:], 1):
+        total[sec] = total[parent] + tail_shift[parent]
+    morph.data[:, SWC.XYZ] += total[secid]
+
+
+def _transform_blocks(morph, blocks, func):
+    """Transforms blocks of sections at once, keeping their lengths.
+
+    New points of a batch of blocks are returned by
+    func(points, base, block, offset, batch), where base are the parent
+    points of the block heads. Blocks are rescaled to their original
+    lengths and put back at the heads, branches at the tails are shifted
+    with the tails in one downstream pass.
+    """
+    parents, sections, perm, heads, tails, secs = blocks
+    for batch in _block_batches(secs):
+        coords = morph.data[:, SWC.XYZ]
+        index, block, offset = _block_index(heads[batch], tails[batch])
+        index = perm[index]
+        points = coords[index]
+        head = points[offset]
+        length = _block_lengths(points, block, offset)
+        points = func(points, coords[parents[perm[heads[batch]]]], block, offset, batch)
+        points = _fit_blocks(points, head, length, block, offset)
+        shifts = points[offset + tails[batch] - heads[batch]] - coords[perm[tails[batch]]]
+        morph.data[index, SWC.X:SWC.Z + 1] = points
+        _translate_children(morph, parents, sections, secs[batch], shifts)
+
+
 def _jitter_coords(morph, nodes, jitter, rng, args):
-    """Adds random jitter to X,Y,Z coordinates."""
-    for node in nodes:
-        sec = list(node.section())
-        if len(sec) > 1:
-            head = sec[0].coord().copy()
-            tail = sec[-1].coord().copy()
-            length = morph.length(sec[1:])
-            coords = morph.coords(sec)
-            if not args.sec:
-                rnd = rng.uniform(-1, 1, np.shape(coords))
-                coords += jitter * rnd
-            else:
-                xlen = 0
-                rnd = rng.uniform(-1, 1, 3)
-                for node in sec:
-                    xlen += node.length()
-                    vec = jitter * rnd * xlen / length
-                    morph.move(vec, node)
-            scale = length / morph.length(sec[1:])
-            coords *= scale
-            shift = head - sec[0].coord()
-            coords += shift
-            for child in sec[-1].siblings:
-                shift = sec[-1].coord() - tail
-                morph.translate(shift, child)
+    """Adds random jitter to X,Y,Z coordinates.
+
+    Random displacements of all sections are drawn at once in the order
+    of the nodes. Jitter per section grows along the section path.
+    """
+    blocks = _select_blocks(morph, nodes, 2)
+    heads, tails = blocks[3], blocks[4]
+    size = tails - heads + 1
+    if not args.sec:
+        rnd = rng.uniform(-1, 1, (size.sum(), 3))
+        start = np.cumsum(size) - size
+    else:
+        rnd = rng.uniform(-1, 1, (len(size), 3))
+
+    def func(points, base, block, offset, batch):
+        if not args.sec:
+            rows = _block_index(start[batch], start[batch] + size[batch] - 1)[0]
+            return points + jitter * rnd[rows]
+        step = jitter * rnd[batch] / _block_lengths(points, block, offset)[:, np.newaxis]
+        moved = points.copy()
+        xlen = np.zeros(len(batch))
+        prev = base.copy()
+        for pos in range(size[batch].max()):
+            active = np.flatnonzero(size[batch] > pos)
+            index = offset[active] + pos
+            xlen[active] += np.linalg.norm(points[index] - prev[active], axis=1)
+            moved[index] += step[active] * xlen[active, np.newaxis]
+            prev[active] = moved[index]
+        return moved
+
+    _transform_blocks(morph, blocks, func)
 
 
 def _twist_branches(morph, nodes, twist, rng):
-    """Rotates branches by random angle."""
-    for node in nodes:
-        axis = node.coord() - node.parent.coord()
-        angle = twist * rng.uniform(-1, 1) * math.pi / 180
-        morph.rotate(axis, angle, node)
+    """Rotates branches by random angle.
+
+    Rotations of nested branches are composed downstream, so that every
+    point is transformed once by the composite rotation of the nearest
+    rotated branch.
+    """
+    if not nodes:
+        return
+    angles = twist * rng.uniform(-1, 1, len(nodes)) * math.pi / 180
+    parents = get_parents(morph).tolist()
+    coords = morph.data[:, SWC.XYZ]
+    heads = [node.ident() - 1 for node in nodes]
+    owner = [-1] * len(parents)
+    for index, head in enumerate(heads):
+        owner[head] = index
+    for node in range(1, len(parents)):
+        if owner[node] < 0:
+            owner[node] = owner[parents[node]]
+    mats = np.tile(np.eye(3), (len(nodes) + 1, 1, 1))
+    shifts = np.zeros((len(nodes) + 1, 3))
+    for index in sorted(range(len(nodes)), key=heads.__getitem__):
+        head = heads[index]
+        up = owner[parents[head]]
+        rot = rotation_matrix(coords[head] - coords[parents[head]], angles[index])
+        mats[index] = mats[up] @ rot
+        shifts[index] = mats[up] @ (coords[head] - rot @ coords[head]) + shifts[up]
+    owner = np.array(owner)
+    morph.data[:, SWC.X:SWC.Z + 1] = (np.einsum('nij,nj->ni', mats[owner], coords)
+                                      + shifts[owner])
 
 
 def _stretch_sections(morph, nodes, stretch):
-    """Straighten sections by relative factor."""
-    for node in nodes:
-        sec = list(node.section())
-        if len(sec) > 1:
-            head = sec[0].coord().copy()
-            tail = sec[-1].coord().copy()
-            length = morph.length(sec[1:])
-            coords = morph.coords(sec)
-            vdir = coords.mean(axis=0) - head
-            vdir /= np.linalg.norm(vdir)
-            for secnode in sec[1:]:
-                coord = secnode.coord()
-                coord += vdir * np.linalg.norm(coord - head) * stretch
-            scale = length / morph.length(sec[1:])
-            coords *= scale
-            shift = head - sec[0].coord()
-            coords += shift
-            for child in sec[-1].siblings:
-                shift = sec[-1].coord() - tail
-                morph.translate(shift, child)
+    """Straighten sections by relative factor.
+
+    Points are moved along the direction from the head to the section
+    centroid, proportionally to their distance from the head.
+    """
+    def func(points, base, block, offset, batch):
+        head = points[offset]
+        size = np.bincount(block)
+        mean = np.stack([np.bincount(block, points[:, i]) for i in range(3)], axis=1)
+        vdir = mean / size[:, np.newaxis] - head
+        vdir /= np.linalg.norm(vdir, axis=1)[:, np.newaxis]
+        dist = np.linalg.norm(points - head[block], axis=1)
+        return points + vdir[block] * (dist * stretch)[:, np.newaxis]
+
+    _transform_blocks(morph, _select_blocks(morph, nodes, 2), func)
 
 
 def _smooth_sections(morph, nodes, smooth):
-    """Smooth sections iteratively by low-pass filtering."""
-    for node in nodes:
-        sec = list(node.section())
-        if len(sec) > 2:
-            head = sec[0].coord().copy()
-            tail = sec[-1].coord().copy()
-            length = morph.length(sec[1:])
-            coords = morph.coords(sec)  # NOSONAR (S1481) "Necessary for in-place NumPy modification"
-            for _ in range(smooth):
-                for secnode in sec[-1::-1]:
-                    coord = secnode.coord()  # NOSONAR (S1481) "Necessary for in-place NumPy modification"
-                    coord += secnode.parent.coord()
-                scale = length / morph.length(sec[1:])
-                coords *= scale
-                shift = head - sec[0].coord()
-                coords += shift
-            for child in sec[-1].siblings:
-                shift = sec[-1].coord() - tail
-                morph.translate(shift, child)
+    """Smooth sections iteratively by low-pass filtering.
+
+    All sections are filtered at once: each point is added to its parent
+    by a gather over the parent indices, then sections are rescaled to
+    their original length and put back at the head. Branches at the
+    tails are shifted with the tails.
+    """
+    def func(points, base, block, offset, batch):
+        head = points[offset]
+        length = _block_lengths(points, block, offset)
+        for _ in range(smooth):
+            prev = np.roll(points, 1, axis=0)
+            prev[offset] = base
+            points = _fit_blocks(points + prev, head, length, block, offset)
+        return points
+
+    _transform_blocks(morph, _select_blocks(morph, nodes, 3), func)
 
 
 def _swap_branches(morph, node1, node2):
@@ -176,10 +290,9 @@ def _set_random_generator(args):
     return rng
 
 
-def modify(args):
-    """Modifies selected parts of morphology reconstruction."""
-    morph = Morph(args.file)
-    rng = _set_random_generator(args)
+def _modify_morph(morph, args, rng=None):
+    """Applies requested modifications, returns modified morphology."""
+    rng = rng if rng is not None else _set_random_generator(args)
 
     # collect nodes to operate on
     nodes = _collect_nodes(morph, args)
@@ -216,4 +329,44 @@ def modify(args):
     if args.prune or args.swap:
         morph = Morph(data=morph.data)
 
-    morph.save(args.out)
+    return morph
+
+
+_source = None
+
+
+def _init_worker(data):
+    """Shares source data with the worker process."""
+    global _source
+    _source = data
+
+
+def _make_variant(task, args):
+    """Modifies a copy of the source morphology with its own random stream."""
+    index, seed = task
+    morph = Morph(data=_source.copy())
+    morph = _modify_morph(morph, args, np.random.default_rng(seed))
+    out = variant_name(args.out, index, args.variants)
+    morph.save(out)
+    return out
+
+
+def modify(args):
+    """Modifies selected parts of morphology reconstruction.
+
+    Several variants are generated in parallel from one reading of the
+    input if requested, with independent random streams spawned from
+    the seed.
+    """
+    morph = Morph(args.file)
+    if not args.variants:
+        morph = _modify_morph(morph, args)
+        morph.save(args.out)
+        return
+
+    seeds = np.random.SeedSequence(args.seed if args.seed else 0).spawn(args.variants)
+    chunksize = max(1, args.variants // (4 * mp.cpu_count()))
+    func = functools.partial(_make_variant, args=args)
+    with mp.Pool(initializer=_init_worker, initargs=(morph.data,)) as pool:
+        for _ in pool.imap_unordered(func, enumerate(seeds), chunksize):
+            pass
@@ -0,0 +1,157 @@
+"""Implementation of CLI pipeline command."""
+
+import contextlib
+import functools
+import io
+import json
+import multiprocessing as mp
+import os
+import shlex
+import sys
+import time
+
+from treem import Morph
+from treem.commands.modify import _modify_morph
+from treem.commands.repair import _repair_morph
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# options writing several outputs per input, not available as a step
+_UNSUPPORTED = {'modify': {'variants': '--variants'},
+                'repair': {'realizations': '--realizations', 'keep': '--keep',
+                           'manifest': '--manifest'}}
+
+
+def _load_spec(spec):
+    """Reads list of steps from spec file (json or yaml)."""
+    with open(spec, encoding='utf-8') as file:
+        if os.path.splitext(spec)[1].lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ValueError('yaml spec requires PyYAML')
+            steps = yaml.safe_load(file)
+        else:
+            steps = json.load(file)
+    if isinstance(steps, dict):
+        steps = steps.get('steps', [])
+    return steps
+
+
+def _parse_options(parser, options):
+    """Parses command-line options, raises ValueError instead of exiting."""
+    stderr = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(stderr):
+            return parser.parse_args(['-', *options])
+    except SystemExit:
+        message = stderr.getvalue().strip().splitlines()
+        raise ValueError(message[-1].split('error: ', 1)[-1] if message
+                         else 'invalid options') from None
+
+
+def _parse_steps(steps, parsers):
+    """Parses step options with the parsers of the commands.
+
+    Each step is a mapping of a command name (modify, repair) to its
+    command-line options, given as a string or a list. Options writing
+    several outputs per input are rejected.
+
+    Returns:
+        list of (command, options).
+    """
+    parsed = []
+    for index, step in enumerate(steps, 1):
+        if not isinstance(step, dict) or len(step) != 1:
+            raise ValueError(f'invalid step {step}')
+        (command, options), = step.items()
+        if command not in parsers:
+            raise ValueError(f'invalid command {command}')
+        if isinstance(options, str):
+            options = shlex.split(options)
+        options = [str(x) for x in options or []]
+        try:
+            options = _parse_options(parsers[command], options)
+        except ValueError as error:
+            raise ValueError(f'step {index} ({command}): {error}') from None
+        for dest, flag in _UNSUPPORTED[command].items():
+            if getattr(options, dest) is not None:
+                raise ValueError(f'step {index} ({command}): {flag} not supported in pipeline')
+        parsed.append((command, options))
+    return parsed
+
+
+def _apply_step(morph, command, options):
+    """Applies single step, returns number of errors and morphology."""
+    if command == 'modify':
+        return 0, _modify_morph(morph, options)
+    vprint = print if options.verbose else lambda *a, **k: None
+    return _repair_morph(morph, options, vprint)
+
+
+def _run_pipeline(reconstruction, steps, out):
+    """Applies all steps to a reconstruction, catches errors of a single file.
+
+    Returns:
+        input file, output file, number of errors, step timings, error message.
+    """
+    name = os.path.splitext(os.path.basename(reconstruction))[0]
+    timings = []
+    err = 0
+    try:
+        start = time.perf_counter()
+        morph = Morph(reconstruction)
+        timings.append(('load', time.perf_counter() - start))
+        for command, options in steps:
+            start = time.perf_counter()
+            nerr, morph = _apply_step(morph, command, options)
+            morph = Morph(data=morph.data)
+            timings.append((command, time.perf_counter() - start))
+            err += nerr
+        target = out.format(name=name)
+        start = time.perf_counter()
+        morph.save(target)
+        timings.append(('save', time.perf_counter() - start))
+        return reconstruction, target, err, timings, None
+    except Exception as error:
+        return reconstruction, None, err, timings, f'{type(error).__name__}: {error}'
+
+
+def pipeline(args):
+    """Applies a sequence of repair and modify steps to reconstructions.
+
+    Steps are read from the spec file and applied in memory, the
+    reconstructions are processed in parallel. Reconstructions that
+    cannot be processed are reported and skipped.
+
+    Returns:
+        number of failed reconstructions and repair errors.
+    """
+    try:
+        steps = _parse_steps(_load_spec(args.spec), args.parsers)
+    except (OSError, ValueError) as error:
+        print(f'cannot read {args.spec}: {error}.')
+        return 1
+    total = len(args.file)
+    chunksize = max(1, total // (4 * mp.cpu_count()))
+    func = functools.partial(_run_pipeline, steps=steps, out=args.out)
+    err = 0
+    report = {}
+    with mp.Pool() as pool:
+        for done, (reconstruction, target, nerr, timings, error) in enumerate(
+                pool.imap_unordered(func, args.file, chunksize), 1):
+            if args.verbose:
+                steps_time = ''.join(f' {x}:{t:.3f}' for x, t in timings)
+                print(f'[{done}/{total}] {reconstruction}{steps_time}', file=sys.stderr)
+            err += nerr
+            if error:
+                print(f'{reconstruction}: {error}, skipped', file=sys.stderr)
+                err += 1
+                continue
+            report[reconstruction] = {'out': target, 'errors': nerr,
+                                      'timings': [list(x) for x in timings]}
+    if args.timings:
+        with open(args.timings, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4, sort_keys=True)
+    return err
@@ -0,0 +1,173 @@
+"""Implementation of CLI pool command."""
+
+import functools
+import json
+import multiprocessing as mp
+import os
+import sys
+
+import numpy as np
+
+from treem import SWC, Morph
+from treem.morph import SEC, get_parents, get_secdata, get_segments
+
+DATA = 'data.npy'
+BRANCHES = 'branches.npy'
+FILES = 'files.json'
+
+
+class LIB():
+    """Definitions of the branch library format.
+
+    Rows describe branches starting at the section heads, the first
+    columns are the section data (see SEC), the following columns are
+    the cell index, the index of the head, the end of the branch and
+    the index of the parent node into the library data, the total
+    length of the branch and the unit vector from the head to the
+    centroid of the branch.
+    """
+    (CELL, FIRST, STOP, PARENT, TOTLEN, DX, DY, DZ) = range(17, 25)
+
+
+def _get_branches(reconstruction):
+    """Collects node data and branches of a reconstruction.
+
+    Nodes are renumbered in depth-first order, so that every branch
+    occupies a contiguous block of the data.
+
+    Returns:
+        node data, branches (without cell and data offset) and error message.
+    """
+    try:
+        morph = Morph(reconstruction)
+        morph = Morph(data=np.array([x.v for x in morph.root.walk()]))
+    except Exception as err:
+        return None, None, f'{reconstruction}: {type(err).__name__}: {err}, skipped'
+    parents = get_parents(morph)
+    secdata = get_secdata(morph, parents)
+    secdata = secdata[secdata[:, SEC.T] != SWC.SOMA]
+    first = secdata[:, SEC.I].astype(int) - 1
+    size = np.ones(len(parents), dtype=int)
+    for node, parent in reversed(list(enumerate(parents.tolist()))[1:]):
+        size[parent] += size[node]
+    stop = first + size[first]
+    length = np.cumsum(np.insert(get_segments(morph, parents)[0], 0, 0))
+    coords = np.cumsum(np.insert(morph.data[:, SWC.XYZ], 0, 0, axis=0), axis=0)
+    totlen = length[stop] - length[first]
+    centroid = (coords[stop] - coords[first]) / size[first, None]
+    direction = centroid - morph.data[first][:, SWC.XYZ]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        direction = np.nan_to_num(direction / np.linalg.norm(direction, axis=1)[:, None])
+    branches = np.column_stack([secdata, np.zeros(len(first)), first, stop,
+                                parents[first], totlen, direction])
+    return morph.data, branches, None
+
+
+def build(args):
+    """Builds a library of intact branches from reconstructions.
+
+    Reconstructions are processed in parallel, nodes are stored in one
+    array and branches are indexed by point type and branch order. The
+    library is a directory of memory-mappable arrays (npy), it is used
+    in place of the reference reconstructions in swc repair --pool.
+
+    Returns:
+        number of failed reconstructions.
+    """
+    total = len(args.file)
+    chunksize = max(1, total // (4 * mp.cpu_count()))
+    err = 0
+    cells = {}
+    with mp.Pool() as pool:
+        results = pool.imap(_get_branches, args.file, chunksize)
+        for reconstruction, (data, branches, error) in zip(args.file, results):
+            if error:
+                print(error, file=sys.stderr)
+                err += 1
+                continue
+            cells[reconstruction] = data, branches
+    datas, rows, offset = [], [], 0
+    for cell, (data, branches) in enumerate(cells.values()):
+        branches[:, LIB.CELL] = cell
+        branches[:, [LIB.FIRST, LIB.STOP, LIB.PARENT]] += offset
+        offset += len(data)
+        datas.append(data)
+        rows.append(branches)
+    data = np.concatenate(datas) if datas else np.zeros((0, 7))
+    branches = np.concatenate(rows) if rows else np.zeros((0, LIB.DZ + 1))
+    branches = branches[np.lexsort((branches[:, SEC.ORDER], branches[:, SEC.T]))]
+    os.makedirs(args.out, exist_ok=True)
+    np.save(os.path.join(args.out, DATA), data)
+    np.save(os.path.join(args.out, BRANCHES), branches)
+    with open(os.path.join(args.out, FILES), 'w', encoding='utf-8') as file:
+        json.dump(list(cells), file, indent=4)
+    return err
+
+
+class _Branches():
+    """Sequence of library branches of the same point type and order."""
+
+    def __init__(self, library, lo, hi):
+        self.library = library
+        self.lo = lo
+        self.hi = hi
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __getitem__(self, idx):
+        return self.library.branch(self.lo + idx)
+
+
+class Library():
+    """Branch library built with swc pool build."""
+
+    def __init__(self, path):
+        """Opens library, node data is memory-mapped.
+
+        Args:
+            path (str): library directory.
+        """
+        self.data = np.load(os.path.join(path, DATA), mmap_mode='r')
+        self.branches = np.load(os.path.join(path, BRANCHES))
+        keys = self.branches[:, [SEC.T, SEC.ORDER]].astype(int)
+        keys, lo, count = np.unique(keys, axis=0, return_index=True, return_counts=True)
+        self.groups = {(t, order): (start, start + n) for (t, order), start, n
+                       in zip(keys.tolist(), lo.tolist(), count.tolist())}
+
+    def branch(self, row):
+        """Returns branch morphology and its start node.
+
+        Branch is copied from the library together with its parent
+        node, which becomes the root.
+
+        Args:
+            row (int): branch index.
+
+        Returns:
+            morphology (treem.Morph), start node (treem.Node).
+        """
+        first, stop, parent = self.branches[row, [LIB.FIRST, LIB.STOP, LIB.PARENT]].astype(int)
+        data = np.concatenate([self.data[parent:parent + 1], self.data[first:stop]])
+        morph = Morph(data=data)
+        return morph, morph.root.siblings[0]
+
+    def candidates(self, point_type):
+        """Returns branches of the given point type by branch order.
+
+        Returns:
+            dict of order: sequence of (morphology, start node).
+        """
+        return {order: _Branches(self, lo, hi)
+                for (t, order), (lo, hi) in self.groups.items() if t == point_type}
+
+
+@functools.lru_cache(maxsize=None)
+def load_library(path):
+    """Opens branch library once per process."""
+    return Library(path)
+
+
+def is_library(files):
+    """Returns True if pool refers to a branch library."""
+    return len(files) == 1 and os.path.isdir(files[0])
@@ -1,37 +1,52 @@
 """Implementation of CLI repair command."""
 
+import argparse
+import functools
+import heapq
+import json
 import math
+import multiprocessing as mp
+import os
+import sys
 from itertools import chain
 
 import numpy as np
 
 from treem import SWC, Morph
-from treem.utils.geom import norm, repair_branch, rotation, sample
+from treem.commands.pool import Library, is_library, load_library
+from treem.io import save_swc, variant_name
+from treem.morph import (
+    SEC,
+    get_blocks,
+    get_parents,
+    get_path,
+    get_secdata,
+    get_sections,
+    get_segments,
+)
+from treem.utils.geom import (
+    SpatialHash,
+    norm,
+    repair_branch,
+    rotation,
+    sample_blocks,
+    voxelize,
+)
 
 SKIP = 'not repaired'
 
 
 def _correct_shrink_xy(morph, args):
     """Corrects for shrinkage in X,Y plane."""
-    scale = np.array([args.shrink_xy, args.shrink_xy, 1])
-    origin = morph.root.coord().copy()
-    for node in morph.root.walk():
-        coord = node.coord()  # NOSONAR (S1481) "Necessary for in-place NumPy modification"
-        coord *= scale
-    shift = origin - morph.root.coord()
-    morph.translate(shift)
+    origin = morph.root.coord()[:2].copy()
+    morph.data[:, SWC.X:SWC.Y + 1] = (morph.data[:, SWC.X:SWC.Y + 1] - origin) * args.shrink_xy + origin
 
 
 def _correct_shrink_z(morph, args):
     """Corrects for shrinkage in Z axis."""
-    if args.bottom_up:
-        bottom = max(x.coord()[2] for x in morph.root.walk())
-    else:
-        bottom = min(x.coord()[2] for x in morph.root.walk())
-    for node in morph.root.walk():
-        z = node.coord()[2]
-        z = bottom + args.shrink * (z - bottom)
-        node.v[SWC.Z] = z
+    z = morph.data[:, SWC.Z]
+    bottom = z.max() if args.bottom_up else z.min()
+    morph.data[:, SWC.Z] = bottom + args.shrink * (z - bottom)
 
 
 def _fix_by_tilt(morph, node, jump):
@@ -52,22 +67,41 @@ def _fix_by_tilt(morph, node, jump):
     return leaf
 
 
-def _correct_zjumps(morph, nodes, args):
-    """Corrects for discontinuties along Z axis in given nodes."""
+def _align_zjumps(morph, nodes):
+    """Aligns z-jumps in given nodes at once.
+
+    Shift of each jump node is accumulated along the tree like path
+    distance (see get_path), so that every node is moved by the sum of
+    the jumps upstream.
+    """
+    parents = get_parents(morph)
+    index = np.array([node.ident() - 1 for node in nodes], dtype=int)
+    z = morph.data[:, SWC.Z]
+    shift = np.zeros(len(z))
+    shift[index] = z[parents[index]] - z[index]
+    morph.data[:, SWC.Z] += get_path(morph, parents, length=shift)
+
+
+def _split_zjumps(morph, nodes):
+    """Splits z-jumps in given nodes, first half of the jump section is moved."""
+    parents = get_parents(morph)
+    sections = get_sections(morph, parents)
+    last, secid = sections[1], sections[6]
+    perm = get_blocks(sections)[0]
+    pos = np.argsort(perm)
+    z = morph.data[:, SWC.Z]
+    for node in nodes:
+        index = node.ident() - 1
+        block = perm[pos[index]:pos[last[secid[index]]] + 1]
+        z[block[:len(block) // 2]] += (z[parents[index]] - z[index]) / 2
+
+
+def _tilt_zjumps(morph, nodes, join):
+    """Tilts sections at z-jumps in given nodes, joins parent sections if requested."""
     for node in nodes:
         jump = node.parent.coord()[2] - node.coord()[2]
-        if args.zjump_mode == 'align':
-            shift = [0, 0, jump]
-            morph.translate(shift, node)
-        elif args.zjump_mode == 'split':
-            shift = [0, 0, jump / 2]
-            jump_sec = list(node.section())
-            for split_node in jump_sec[:int(len(jump_sec) / 2)]:
-                morph.move(shift, split_node)
-        elif args.zjump_mode == 'tilt':
-            _ = _fix_by_tilt(morph, node, jump)
-        elif args.zjump_mode == 'join':
-            leaf = _fix_by_tilt(morph, node, jump)
+        leaf = _fix_by_tilt(morph, node, jump)
+        if join:
             start = list(node.section(reverse=True))[-1].parent
             dist = max(norm(start.coord() - jump_node.coord())
                        for jump_node in node.leaves())
@@ -80,6 +114,16 @@ def _correct_zjumps(morph, nodes, args):
             morph.rotate(axis, angle, node)
 
 
+def _correct_zjumps(morph, nodes, args):
+    """Corrects for discontinuties along Z axis in given nodes."""
+    if args.zjump_mode == 'align':
+        _align_zjumps(morph, nodes)
+    elif args.zjump_mode == 'split':
+        _split_zjumps(morph, nodes)
+    elif args.zjump_mode in ('tilt', 'join'):
+        _tilt_zjumps(morph, nodes, join=args.zjump_mode == 'join')
+
+
 def _fix_by_joint(nodes, vprint):
     """Set diameter to mean value of neighbour nodes."""
     err = 0
@@ -106,52 +150,75 @@ def _fix_by_sec(morph, nodes):
         node.v[SWC.R] = r
 
 
-def _fix_by_order(morph, nodes, pool, types, vprint, args):
-    """Set diameter to mean value of sections with the same topological order."""
+def _radius_table(secdatas, column):
+    """Tabulates section radii by point type and section order or breadth.
+
+    Args:
+        secdatas (list): section data of the morphologies (see get_secdata).
+        column (int): section key, SEC.ORDER or SEC.BREADTH.
+
+    Returns:
+        dict of (type, key): (sum of mean section radii, number of sections).
+    """
+    table = {}
+    for secdata in secdatas:
+        for point_type, key, diam in secdata[:, [SEC.T, column, SEC.DIAM]].tolist():
+            total, count = table.get((int(point_type), int(key)), (0.0, 0))
+            table[int(point_type), int(key)] = total + diam / 2, count + 1
+    return table
+
+
+@functools.lru_cache(maxsize=None)
+def _load_pool(files):
+    """Loads pool morphologies or branch library once per process (tuple of file names)."""
+    if is_library(files):
+        return load_library(files[0])
+    return tuple(Morph(f) for f in files)
+
+
+@functools.lru_cache(maxsize=None)
+def _pool_radius_table(files, column):
+    """Returns radius table of the pool, cached per process."""
+    pool = _load_pool(files)
+    if isinstance(pool, Library):
+        return _radius_table([pool.branches], column)
+    return _radius_table(map(get_secdata, pool), column)
+
+
+def _node_keys(morph, nodes, column):
+    """Returns order or breadth of the given nodes from the section table."""
+    _, _, _, _, order, breadth, secid = get_sections(morph)
+    keys = order if column == SEC.ORDER else breadth
+    return [int(keys[secid[node.ident() - 1]]) for node in nodes]
+
+
+def _fix_by_table(morph, nodes, types, vprint, args, column, name):
+    """Set diameter to mean value of sections with the same order or breadth."""
     err = 0
-    for node in nodes:
-        point_type = node.type()
-        order = node.order()
-        if args.pool:
-            radii = [m.radii(sec).mean() for m in pool
-                     for sec in m.root.sections()
-                     if sec[0].type() in types and sec[0].order() == order]
-            if radii:
-                r = np.mean(radii)
-                node.v[SWC.R] = r
-            else:
-                vprint(f'diam in node {node.ident()} (order {order}) {SKIP}')
-                err += 1
+    if args.pool:
+        table = _pool_radius_table(tuple(args.pool), column)
+    else:
+        table = _radius_table([get_secdata(morph)], column)
+    for node, key in zip(nodes, _node_keys(morph, nodes, column)):
+        point_types = types if args.pool else (node.type(),)
+        stats = [table[t, key] for t in point_types if (t, key) in table]
+        count = sum(x[1] for x in stats)
+        if count:
+            node.v[SWC.R] = sum(x[0] for x in stats) / count
         else:
-            r = np.array([morph.radii(sec).mean()
-                          for sec in morph.root.sections()
-                          if sec[0].type() == point_type and sec[0].order() == order]).mean()
-            node.v[SWC.R] = r
+            vprint(f'diam in node {node.ident()} ({name} {key}) {SKIP}')
+            err += 1
     return err
 
 
-def _fix_by_breadth(morph, nodes, pool, types, vprint, args):
+def _fix_by_order(morph, nodes, types, vprint, args):
+    """Set diameter to mean value of sections with the same topological order."""
+    return _fix_by_table(morph, nodes, types, vprint, args, SEC.ORDER, 'order')
+
+
+def _fix_by_breadth(morph, nodes, types, vprint, args):
     """Set diameter to mean value of sections with the same topological breadth."""
-    err = 0
-    for node in nodes:
-        point_type = node.type()
-        breadth = node.breadth()
-        if args.pool:
-            radii = [m.radii(sec).mean() for m in pool
-                     for sec in m.root.sections()
-                     if sec[0].type() in types and sec[0].breadth() == breadth]
-            if radii:
-                r = np.mean(radii)
-                node.v[SWC.R] = r
-            else:
-                vprint(f'diam in node {node.ident()} (breadth {breadth}) {SKIP}')
-                err += 1
-        else:
-            r = np.array([morph.radii(sec).mean()
-                          for sec in morph.root.sections()
-                          if sec[0].type() == point_type and sec[0].breadth() == breadth]).mean()
-            node.v[SWC.R] = r
-    return err
+    return _fix_by_table(morph, nodes, types, vprint, args, SEC.BREADTH, 'breadth')
 
 
 def _fix_by_value(nodes, args):
@@ -160,7 +227,7 @@ def _fix_by_value(nodes, args):
         node.v[SWC.R] = args.diam_value / 2
 
 
-def _correct_diameters(morph, nodes, pool, vprint, args):
+def _correct_diameters(morph, nodes, vprint, args):
     """Corrects diameters in given nodes."""
     types = None
     err = 0
@@ -171,9 +238,9 @@ def _correct_diameters(morph, nodes, pool, vprint, args):
     elif args.diam_mode == 'sec':
         _fix_by_sec(morph, nodes)
     elif args.diam_mode == 'order':
-        err += _fix_by_order(morph, nodes, pool, types, vprint, args)
+        err += _fix_by_order(morph, nodes, types, vprint, args)
     elif args.diam_mode == 'breadth':
-        err += _fix_by_breadth(morph, nodes, pool, types, vprint, args)
+        err += _fix_by_breadth(morph, nodes, types, vprint, args)
     if args.diam_mode == 'value':
         _fix_by_value(nodes, args)
     return err
@@ -216,7 +283,9 @@ def _graft_branches(morph, morig, graft_points, pool, vprint, rng, args):
         point_type = args.graft_point_type
         intact_branches = []
         err = 0
-        if args.pool:
+        if isinstance(pool, Library):
+            intact_branches = pool.candidates(point_type).get(1, [])
+        elif args.pool:
             for rec in pool:
                 sections = filter(lambda x: x[0].type() == point_type and x[0].order() == 1, rec.root.sections())
                 nodes = chain(x[0] for x in sections)
@@ -257,15 +326,25 @@ def _make_intact_dict(morph, nodes):
     return intact_branches
 
 
+@functools.lru_cache(maxsize=None)
+def _pool_branches(pool, point_type):
+    """Collects pool branches by order, cached per process (tuple of morphologies)."""
+    intact_branches = {}
+    for rec in pool:
+        sections = filter(lambda x, t=point_type: x[0].type() == t, rec.root.sections())
+        nodes = chain(x[0] for x in sections)
+        rec_branches = _make_intact_dict(rec, nodes)
+        intact_branches.update(rec_branches)
+    return intact_branches
+
+
 def _collect_intact_branches(morig, pool, point_type, args):
         """Collects branches not containing cut points."""
         intact_branches = {}
-        if args.pool:
-            for rec in pool:
-                sections = filter(lambda x, t=point_type: x[0].type() == t, rec.root.sections())
-                nodes = chain(x[0] for x in sections)
-                rec_branches = _make_intact_dict(rec, nodes)
-                intact_branches.update(rec_branches)
+        if isinstance(pool, Library):
+            intact_branches = pool.candidates(point_type)
+        elif args.pool:
+            intact_branches = _pool_branches(pool, point_type)
         else:
             sections = filter(lambda x, t=point_type: x[0].type() == t, morig.root.sections())
             nodes = chain(x[0] for x in sections)
@@ -289,10 +368,71 @@ def _repair_by_order(morph, intact_branches, node, order, vprint, rng, args):
         return err
 
 
+def _segment_ends(morph, node=None):
+    """Returns start and end points of neurite segments.
+
+    Segment connecting the root to the given node is included.
+    """
+    parents = get_parents(morph)
+    coords = morph.data[:, SWC.XYZ]
+    mask = morph.data[:, SWC.T] != SWC.SOMA
+    mask[0] = node is not None
+    starts = coords[parents[mask]]
+    if node is not None:
+        starts[0] = node.coord()
+    return starts, coords[mask]
+
+
+def _repair_by_order_free(morph, intact_branches, node, order, space, vprint, rng, args):
+    """Repair using branches of given topological order not crossing other neurites.
+
+    Candidates crossing occupied cells of the spatial hash (except next
+    to the cut point) are rejected, the number of candidates is bounded.
+    With forced repair the candidate crossing the fewest cells is used
+    when all are rejected.
+    """
+    candidates = intact_branches[order]
+    placed = []
+
+    def accept(tree):
+        starts, ends = _segment_ends(tree, node)
+        hits = space.count(starts, ends, center=node.coord())
+        placed.append((hits, starts, ends))
+        return hits == 0
+
+    tried = []
+    for _ in range(args.collision_retries):
+        idx = rng.choice(len(candidates))
+        rec, rep = candidates[idx]
+        placed.clear()
+        if repair_branch(morph, node, rec, rep, force=args.force_repair,
+                         keep_radii=args.keep_radii, accept=accept):
+            space.add(*placed[0][1:])
+            vprint(f'using {rep.ident()} (order {order}) ... done')
+            return 0
+        if placed:
+            tried.append((placed[0][0], idx))
+    if args.force_repair and tried:
+        hits, idx = min(tried)
+        rec, rep = candidates[idx]
+        placed.clear()
+        repair_branch(morph, node, rec, rep, force=True, keep_radii=args.keep_radii,
+                      accept=lambda tree: accept(tree) or True)
+        space.add(*placed[0][1:])
+        vprint(f'using {rep.ident()} (order {order}) ... done, crossing {hits} cells')
+        return 0
+    vprint(f'... {len(tried)} of {args.collision_retries} candidates crossing, {SKIP}')
+    return 1
+
+
 def _repair_cut_branches(morph, morig, cuts, pool, vprint, rng, args):
     """Repairs cut branches."""
     err = 0
     types = {x.type() for x in morph.root.walk() if x.ident() in cuts}
+    space = None
+    if args.collision:
+        space = SpatialHash(args.collision)
+        space.add(*_segment_ends(morph))
     for point_type in types:
         intact_branches = _collect_intact_branches(morig, pool, point_type, args)
 
@@ -301,22 +441,22 @@ def _repair_cut_branches(morph, morig, cuts, pool, vprint, rng, args):
             order = node.order()
             vprint(f'repairing node {node.ident()} (order {order})',
                    end=' ')
-            if order in intact_branches:
-                err += _repair_by_order(morph, intact_branches, node, order, vprint, rng, args)
+            if order not in intact_branches and order - 1 in intact_branches:
+                order = order - 1
+            elif order not in intact_branches and args.force_repair and intact_branches:
+                order = rng.choice(list(intact_branches.keys()))
 
-            elif order - 1 in intact_branches:
-                err += _repair_by_order(morph, intact_branches, node, order - 1, vprint, rng, args)
-
-            elif args.force_repair:
-                if intact_branches:
-                    order = rng.choice(list(intact_branches.keys()))
-                    err += _repair_by_order(morph, intact_branches, node, order, vprint, rng, args)
-                else:
-                    err += 1
+            if order not in intact_branches:
+                err += 1
+                if args.force_repair:
                     vprint(f'... no intact branches, {SKIP}')
+                else:
+                    vprint(f'... {SKIP}')
+            elif space is not None:
+                err += _repair_by_order_free(morph, intact_branches, node, order, space,
+                                             vprint, rng, args)
             else:
-                err += 1
-                vprint(f'... {SKIP}')
+                err += _repair_by_order(morph, intact_branches, node, order, vprint, rng, args)
     return err
 
 
@@ -345,44 +485,57 @@ def _delete_branches(morph, idents):
 
 
 def _resample(morph, res):
-    """Samples neurites with new spatial resolution and returns new morphology."""
-    ident = 1
-    data = []
-    idmap = {-1: -1}
-    for sec in filter(lambda x: x[0].type() == SWC.SOMA,
-                      morph.root.sections()):
-        for node in sec:
-            v = node.v.copy()
-            i, p = v[SWC.I].astype(int), v[SWC.P].astype(int)
-            v[SWC.I], v[SWC.P] = ident, idmap[p]
-            idmap[i] = ident
-            data.append(v)
-            ident += 1
-    for sec in filter(lambda x: x[0].type() in
-                      set(SWC.TYPES).difference((SWC.SOMA,)),
-                      morph.root.sections()):
-        length = morph.length(sec)
-        points = morph.points(sec)
-        head = sec[0]
-        tail = sec[-1]
-        parent_point = head.parent.v[SWC.XYZR]
-        # same base radius if parent is root
-        if head.parent.is_root():
-             parent_point[3] = head.v[SWC.R]
-        points = np.insert(points, 0, parent_point, axis=0)
-        points = sample(points, np.ceil(length / res).astype(int))
-        points = points[1:]
-        start = True
-        for ident, point in enumerate(points, ident):
-            x, y, z, r = point
-            pid = idmap[head.parent_ident()] if start else ident - 1
-            v = np.array([ident, head.type(), x, y, z, r, pid])
-            start = False if start else start
-            data.append(v)
-        idmap[tail.v[SWC.I]] = ident
-        ident += 1
-    return Morph(data=np.array(data))
-
+    """Samples neurites with new spatial resolution and returns new morphology.
+
+    Soma sections are copied, neurite sections are sampled at once
+    together with their parent points. Sections keep the order of
+    Morph.root.sections().
+    """
+    data = morph.data
+    parents = get_parents(morph)
+    sections = get_sections(morph, parents)
+    first, last, preorder, secid = sections[0], sections[1], sections[2], sections[6]
+    perm, blocks = get_blocks(sections)
+    count = np.bincount(secid, minlength=len(first))
+    types = data[first, SWC.T].astype(int)
+    soma = preorder[types[preorder] == SWC.SOMA]
+    neurites = preorder[np.isin(types[preorder],
+                                list(set(SWC.TYPES).difference((SWC.SOMA,))))]
+    newid = np.zeros(len(data), dtype=int)
+
+    soma_nodes = np.concatenate([perm[blocks[sec]:blocks[sec] + count[sec]] for sec in soma])
+    newid[soma_nodes] = np.arange(1, len(soma_nodes) + 1)
+    soma_data = data[soma_nodes].copy()
+    soma_data[:, SWC.I] = newid[soma_nodes]
+    soma_data[:, SWC.P] = np.where(soma_nodes == 0, -1, newid[parents[soma_nodes]])
+
+    heads, tails = first[neurites], last[neurites]
+    sizes = count[neurites] + 1
+    starts = np.cumsum(sizes) - sizes
+    pos = np.arange(sizes.sum()) - np.repeat(starts, sizes) + np.repeat(blocks[neurites] - 1, sizes)
+    index = perm[pos]
+    index[starts] = parents[heads]
+    points = data[index][:, SWC.XYZR]
+    # same base radius if parent is root
+    at_root = parents[heads] == 0
+    points[starts[at_root], 3] = data[heads[at_root], SWC.R]
+    length = np.bincount(secid, weights=get_segments(morph, parents)[0],
+                         minlength=len(first))[neurites]
+    nums = np.maximum(np.ceil(length / res).astype(int), 2)
+    keep = np.ones(nums.sum(), dtype=bool)
+    keep[np.cumsum(nums) - nums] = False
+    points = sample_blocks(points, starts, nums)[keep]
+
+    counts = nums - 1
+    idents = len(soma_nodes) + np.arange(1, counts.sum() + 1)
+    newid[tails] = len(soma_nodes) + np.cumsum(counts)
+    pids = idents - 1
+    pids[np.cumsum(counts) - counts] = newid[parents[heads]]
+    neurite_data = np.column_stack([idents, np.repeat(types[neurites], counts), points, pids])
+    # IDs are sequential, renumbering by Morph(data=...) is not needed
+    resampled = Morph()
+    resampled.load(data=np.concatenate([soma_data, neurite_data]))
+    return resampled
 
 
 def _flip(morph, flip):
@@ -398,12 +551,12 @@ def _flip(morph, flip):
     morph.data[:, SWC.XYZ] -= shift
 
 
-def repair(args):
-    """Corrects morphology reconstruction at the given nodes."""
-    vprint = print if args.verbose else lambda *a, **k: None
-    morph = Morph(args.file)
-    rng = _set_random_generator(args)
-    pool = None
+def _correct_morph(morph, args, vprint):
+    """Applies deterministic corrections preceding repair of cut neurites.
+
+    Returns:
+        number of errors.
+    """
     err = 0
 
     if args.translate:
@@ -424,12 +577,21 @@ def repair(args):
         nodes = [x for x in morph.root.walk() if x.ident() in args.zjump]
         _correct_zjumps(morph, nodes, args)
 
-    if args.pool:
-        pool = [Morph(f) for f in args.pool]
-
     if args.diam:
         nodes = [x for x in morph.root.walk() if x.ident() in args.diam]
-        err += _correct_diameters(morph, nodes, pool, vprint, args)
+        err += _correct_diameters(morph, nodes, vprint, args)
+
+    return err
+
+
+def _restructure_morph(morph, args, vprint, rng):
+    """Repairs cut neurites and applies following steps.
+
+    Returns:
+        number of errors and morphology.
+    """
+    pool = _load_pool(tuple(args.pool)) if args.pool else None
+    err = 0
 
     if args.cut:
         cuts = {x for x in args.cut if morph.node(x).type() != SWC.SOMA}
@@ -449,5 +611,244 @@ def repair(args):
     if args.center:
         morph.data[:, SWC.XYZ] -= morph.root.coord()
 
+    return err, morph
+
+
+def _repair_morph(morph, args, vprint, rng=None):
+    """Applies requested corrections, returns number of errors and morphology."""
+    rng = rng if rng is not None else _set_random_generator(args)
+    err = _correct_morph(morph, args, vprint)
+    nerr, morph = _restructure_morph(morph, args, vprint, rng)
+    return err + nerr, morph
+
+
+def _length_density(morph, res):
+    """Returns occupied voxels and neurite length in them."""
+    parents = get_parents(morph)
+    coords = morph.data[:, SWC.XYZ]
+    mask = morph.data[:, SWC.T] != SWC.SOMA
+    mask[0] = False
+    voxels, length = voxelize(coords[parents[mask]], coords[mask], res)
+    if not len(voxels):
+        return np.zeros((0, 3), dtype=int), np.zeros(0)
+    voxels, index = np.unique(voxels, axis=0, return_inverse=True)
+    return voxels, np.bincount(index.ravel(), weights=length)
+
+
+def _overlap(morph, intact, res):
+    """Returns fraction of added neurite length in voxels of the intact part.
+
+    Added length is the excess of the length density of the repaired
+    morphology over the density of the intact part.
+    """
+    voxels, length = _length_density(morph, res)
+    intact_voxels, intact_length = intact
+    keys, index = np.unique(np.concatenate([intact_voxels, voxels]), axis=0,
+                            return_inverse=True)
+    index = index.ravel()
+    before = np.bincount(index[:len(intact_voxels)], weights=intact_length,
+                         minlength=len(keys))
+    after = np.bincount(index[len(intact_voxels):], weights=length, minlength=len(keys))
+    added = np.clip(after - before, 0, None)
+    total = added.sum()
+    return float(added[before > 0].sum() / total) if total > 0 else 0.0
+
+
+MANIFEST_KEYS = ('cut', 'diam', 'zjump', 'delete', 'seed', 'out')
+
+
+def _load_manifest(manifest):
+    """Reads per-file options from manifest file (json).
+
+    Manifest is a list of entries {"file": <str>, "cut": [<int>, ...], ...}
+    or a mapping of file names to entries. Entries may set point ids
+    (cut, diam, zjump, delete), random seed and output file.
+
+    Returns:
+        list of (file, options).
+    """
+    with open(manifest, encoding='utf-8') as file:
+        entries = json.load(file)
+    if isinstance(entries, dict):
+        entries = [{'file': name, **(options or {})} for name, options in entries.items()]
+    tasks = []
+    for entry in entries:
+        if not isinstance(entry, dict) or 'file' not in entry:
+            raise ValueError(f'invalid entry {entry}')
+        options = {k: v for k, v in entry.items() if k != 'file'}
+        unknown = set(options).difference(MANIFEST_KEYS)
+        if unknown:
+            raise ValueError(f'invalid key {", ".join(sorted(unknown))}')
+        tasks.append((entry['file'], options))
+    return tasks
+
+
+def _output_name(out, reconstruction):
+    """Returns output file name of a reconstruction in batch mode.
+
+    Template with {name} field is formatted with the input name,
+    otherwise the input name is prepended to the file name.
+    """
+    name = os.path.splitext(os.path.basename(reconstruction))[0]
+    if '{name}' in out:
+        return out.format(name=name)
+    head, tail = os.path.split(out)
+    return os.path.join(head, f'{name}_{tail}')
+
+
+def _init_worker(pool):
+    """Loads pool reconstructions or branch library once per worker process."""
+    if pool:
+        _load_pool(tuple(pool))
+
+
+def _repair_file(task, args):
+    """Repairs single reconstruction of the manifest, catches errors of a single file.
+
+    Returns:
+        input file, output file, number of errors, error message.
+    """
+    reconstruction, options, seed = task
+    args = argparse.Namespace(**{**vars(args), **options})
+    rng = np.random.default_rng(options['seed'] if 'seed' in options else seed)
+    try:
+        morph = Morph(reconstruction)
+        err, morph = _repair_morph(morph, args, lambda *a, **k: None, rng)
+        target = options['out'] if 'out' in options else _output_name(args.out, reconstruction)
+        morph.save(target)
+        return reconstruction, target, err, None
+    except Exception as error:
+        return reconstruction, None, 0, f'{type(error).__name__}: {error}'
+
+
+def _repair_batch(args):
+    """Repairs reconstructions listed in the manifest in parallel.
+
+    Pool reconstructions (or branch library) are loaded once per worker
+    process. Random streams are spawned from the seed in the order of
+    the manifest, so results do not depend on scheduling.
+
+    Returns:
+        number of failed reconstructions and points not repaired.
+    """
+    try:
+        tasks = _load_manifest(args.manifest)
+    except (OSError, ValueError) as error:
+        print(f'cannot read {args.manifest}: {error}.')
+        return 1
+    total = len(tasks)
+    seeds = np.random.SeedSequence(args.seed if args.seed else 0).spawn(total)
+    tasks = [(reconstruction, options, seed)
+             for (reconstruction, options), seed in zip(tasks, seeds)]
+    chunksize = max(1, total // (4 * mp.cpu_count()))
+    func = functools.partial(_repair_file, args=args)
+    repaired, failed, skipped = 0, 0, 0
+    with mp.Pool(initializer=_init_worker, initargs=(args.pool,)) as pool:
+        for done, (reconstruction, target, nerr, error) in enumerate(
+                pool.imap_unordered(func, tasks, chunksize), 1):
+            if args.verbose:
+                print(f'[{done}/{total}] {reconstruction}', file=sys.stderr)
+            if error:
+                print(f'{reconstruction}: {error}, skipped', file=sys.stderr)
+                failed += 1
+                continue
+            repaired += 1
+            skipped += nerr
+    print(f'files repaired: {repaired}, failed: {failed}')
+    print(f'points {SKIP}: {skipped}')
+    return failed + skipped
+
+
+SCORE_RES = 10.0
+
+_source = None
+_intact = None
+
+
+def _init_realization(data, intact, pool):
+    """Shares corrected source data and intact density with the worker process."""
+    global _source, _intact
+    _source = data
+    _intact = intact
+    _init_worker(pool)
+
+
+def _make_realization(task, args):
+    """Repairs a copy of the source morphology with its own random stream.
+
+    Realization is saved unless the best ones are selected, the data is
+    returned then.
+
+    Returns:
+        index, number of errors, score, data (or None).
+    """
+    index, seed = task
+    morph = Morph()
+    morph.load(data=_source.copy())
+    err, morph = _restructure_morph(morph, args, lambda *a, **k: None,
+                                    np.random.default_rng(seed))
+    if args.keep:
+        return index, err, _overlap(morph, _intact, SCORE_RES), morph.data
+    morph.save(variant_name(args.out, index, args.realizations))
+    return index, err, None, None
+
+
+def _repair_realizations(args, vprint):
+    """Produces several stochastic repairs of one reconstruction in parallel.
+
+    Corrections preceding the repair of cut neurites are applied once,
+    realizations follow with independent random streams spawned from
+    the seed. If requested, only the realizations with the lowest
+    fraction of added neurite length overlapping the intact part
+    (voxels of SCORE_RES um) are saved.
+
+    Returns:
+        number of errors.
+    """
+    morph = Morph(args.file)
+    err = _correct_morph(morph, args, vprint)
+    intact = _length_density(morph, SCORE_RES) if args.keep else None
+    total = args.realizations
+    seeds = np.random.SeedSequence(args.seed if args.seed else 0).spawn(total)
+    chunksize = max(1, total // (4 * mp.cpu_count()))
+    func = functools.partial(_make_realization, args=args)
+    best = []
+    with mp.Pool(initializer=_init_realization,
+                 initargs=(morph.data, intact, args.pool)) as pool:
+        for done, (index, nerr, score, data) in enumerate(
+                pool.imap_unordered(func, enumerate(seeds), chunksize), 1):
+            if args.verbose:
+                print(f'[{done}/{total}] realization {index}', file=sys.stderr)
+            if not args.keep:
+                err += nerr
+                continue
+            heapq.heappush(best, (-score, -index, nerr, data))
+            if len(best) > args.keep:
+                heapq.heappop(best)
+    for score, index, nerr, data in sorted(best, reverse=True):
+        out = variant_name(args.out, -index, total)
+        save_swc(out, data)
+        print(f'{out} {-score:g}')
+        err += nerr
+    return err
+
+
+def repair(args):
+    """Corrects morphology reconstruction at the given nodes.
+
+    Reconstructions listed in a manifest are repaired in parallel,
+    several realizations of the repair of one reconstruction are
+    produced in parallel if requested.
+    """
+    if args.manifest:
+        return _repair_batch(args)
+    if not args.file:
+        print('input file or manifest is required.')
+        return 1
+    vprint = print if args.verbose else lambda *a, **k: None
+    if args.realizations:
+        return _repair_realizations(args, vprint)
+    morph = Morph(args.file)
+    err, morph = _repair_morph(morph, args, vprint)
     morph.save(args.out)
     return err
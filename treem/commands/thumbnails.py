@@ -0,0 +1,132 @@
+"""Implementation of CLI thumbnails command."""
+
+import multiprocessing as mp
+import os
+import sys
+from itertools import zip_longest
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from treem import SWC, Morph
+from treem.commands.view import _NCOLORS, _colors
+from treem.utils.plot import plot_neuron, plot_projection
+
+DPI = 100
+
+_figure = None
+_args = None
+
+
+def _init_worker(args):
+    """Creates the figure reused by all images of the worker process.
+
+    The figure is drawn on the Agg canvas directly (no pyplot), a grid
+    montage has one axes per cell.
+    """
+    global _figure, _args
+    rows, cols = args.grid if args.grid else (1, 1)
+    _figure = Figure(figsize=(cols * args.size / DPI, rows * args.size / DPI), dpi=DPI)
+    FigureCanvasAgg(_figure)
+    projection = None if args.proj else '3d'
+    _figure.subplots(rows, cols, squeeze=False, subplot_kw={'projection': projection})
+    _figure.subplots_adjust(left=0, bottom=0, right=1, top=1, wspace=0, hspace=0)
+    _args = args
+
+
+def _set_cube_limits(ax):
+    """Sets equal limits of 3D axes around the data."""
+    lo = np.array([ax.xy_dataLim.xmin, ax.xy_dataLim.ymin, ax.zz_dataLim.xmin])
+    hi = np.array([ax.xy_dataLim.xmax, ax.xy_dataLim.ymax, ax.zz_dataLim.xmax])
+    center, half = (lo + hi) / 2, max(hi - lo) / 2
+    ax.set_xlim(center[0] - half, center[0] + half)
+    ax.set_ylim(center[1] - half, center[1] + half)
+    ax.set_zlim(center[2] - half, center[2] + half)
+    ax.set_box_aspect([1, 1, 1], zoom=1.6)
+
+
+def _draw_cell(ax, reconstruction, args):
+    """Draws one reconstruction into cleared axes."""
+    morph = Morph(reconstruction)
+    types = args.type if args.type else SWC.TYPES
+    colors = {t: _colors[t % _NCOLORS] for t in SWC.TYPES}
+    if args.proj:
+        plot_projection(ax, morph, args.proj, types, colors=colors,
+                        linewidth=args.linewidth)
+        ax.set_aspect('equal', adjustable='datalim')
+    else:
+        ax.set_proj_type('ortho')
+        plot_neuron(ax, morph, types, colors=colors, linewidth=args.linewidth)
+        _set_cube_limits(ax)
+    if args.label:
+        name = os.path.splitext(os.path.basename(reconstruction))[0]
+        ax.set_title(name, loc='left', y=0.98, pad=0, va='top', fontsize='small')
+
+
+def _render(task):
+    """Renders reconstructions into one image (one cell or montage page).
+
+    Returns:
+        output file (None if nothing was drawn) and error messages.
+    """
+    target, reconstructions = task
+    errors = []
+    for ax, reconstruction in zip_longest(_figure.axes, reconstructions):
+        ax.clear()
+        ax.set_axis_off()
+        if reconstruction is None:
+            continue
+        try:
+            _draw_cell(ax, reconstruction, _args)
+        except Exception as err:
+            errors.append(f'{reconstruction}: {type(err).__name__}: {err}, skipped')
+            ax.clear()
+            ax.set_axis_off()
+    if len(errors) == len(reconstructions):
+        return None, errors
+    dirname = os.path.dirname(target)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    _figure.savefig(target)
+    return target, errors
+
+
+def _get_tasks(args):
+    """Returns output files and their reconstructions."""
+    if not args.grid:
+        return [(args.out.format(name=os.path.splitext(os.path.basename(x))[0]), [x])
+                for x in args.file]
+    rows, cols = args.grid
+    step = rows * cols
+    pages = range(0, len(args.file), step)
+    width = len(str(len(pages)))
+    return [(args.out.format(name=f'montage_{page // step + 1:0{width}d}'),
+             args.file[page:page + step]) for page in pages]
+
+
+def thumbnails(args):
+    """Renders preview images of many reconstructions.
+
+    Images are rendered headless (Agg) in parallel, every worker process
+    reuses its figure and writes the images as they finish. With a fixed
+    projection, neurites are drawn on 2D axes, otherwise in 3D as in swc
+    view. A grid montage places several cells in one image. Files that
+    cannot be drawn are reported and skipped.
+
+    Returns:
+        number of failed reconstructions.
+    """
+    tasks = _get_tasks(args)
+    total = len(tasks)
+    chunksize = max(1, total // (4 * mp.cpu_count()))
+    err = 0
+    with mp.Pool(initializer=_init_worker, initargs=(args,)) as pool:
+        for done, (target, errors) in enumerate(
+                pool.imap_unordered(_render, tasks, chunksize), 1):
+            for error in errors:
+                print(error, file=sys.stderr)
+            err += len(errors)
+            if args.verbose and target:
+                print(f'[{done}/{total}] {target}', file=sys.stderr)
+    return err
@@ -64,23 +64,27 @@ def _load_and_plot_morphology(args, ax, types):
     if args.mode == 'neurites':
         for count, file_name in enumerate(reversed(args.file)):
             morph = _get_morph(file_name, count)
-            plot_neuron(ax, morph, types, linewidth=args.linewidth)
+            plot_neuron(ax, morph, types, linewidth=args.linewidth,
+                        single_line=args.single_line)
     elif args.mode == 'cells':
         for count, file_name in enumerate(reversed(args.file)):
             morph = _get_morph(file_name, count)
             colors = {k: f'C{count % _NCOLORS}' for k in types}
-            plot_neuron(ax, morph, types, colors=colors, linewidth=args.linewidth)
+            plot_neuron(ax, morph, types, colors=colors, linewidth=args.linewidth,
+                        single_line=args.single_line)
     elif args.mode == 'shadow':
         # plot shadow files first
         for file_name in reversed(args.file[1:]):
             shadow_morph = _get_morph(file_name)
             colors = {k: args.shadow_color for k in types}
             plot_neuron(ax, shadow_morph, types, colors=colors,
-                        linewidth=args.shadow_width)
+                        linewidth=args.shadow_width,
+                        single_line=args.single_line)
         # plot main file last
         if args.file:
             morph = _get_morph(args.file[0])
-            plot_neuron(ax, morph, types, linewidth=args.linewidth)
+            plot_neuron(ax, morph, types, linewidth=args.linewidth,
+                        single_line=args.single_line)
     # return the last plotted morphology object for subsequent overlays
     return morph
 
@@ -1,6 +1,7 @@
 """SWC data format defintion and services."""
 
 import json
+import os
 
 import numpy as np
 
@@ -36,3 +37,15 @@ def save_swc(target, data):
     """Writes data to SWC file."""
     fmt = '%d %d %g %g %g %g %d'
     return np.savetxt(target, data, fmt=fmt)
+
+
+def variant_name(out, index, count):
+    """Returns output file name of one of several outputs.
+
+    Template with a replacement field is formatted with the index,
+    otherwise zero-padded index is appended to the file name.
+    """
+    if '{' in out:
+        return out.format(index)
+    root, ext = os.path.splitext(out)
+    return f'{root}_{index:0{len(str(count - 1))}d}{ext}'
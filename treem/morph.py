@@ -73,7 +73,10 @@ class Node(Tree):
         return np.linalg.norm(self.v[SWC.XYZ] - origin)
 
     def path(self):
-        """Returns path distance of the node to root (float)."""
+        """Returns path distance of the node to root (float).
+
+        See get_path() for path distances of all nodes at once.
+        """
         return sum(node.length() for node in self.walk(reverse=True))
 
     def radius(self):
@@ -238,6 +241,22 @@ class Morph():
         """Shifts node coordinates by 3D vector (float[3])."""
         node.v[SWC.XYZ] += shift
 
+    def branch(self, node):
+        """Returns index of the branch at the node into the data.
+
+        Branch of depth-first ordered data is a contiguous block, a
+        slice is returned then, otherwise the indices are collected by
+        traversal.
+        """
+        first = node.ident() - 1
+        parents = self.data[:, SWC.P].astype(int) - 1
+        outside = np.flatnonzero(parents[first + 1:] < first)
+        last = first + 1 + outside[0] if len(outside) else len(parents)
+        rest = parents[last:]
+        if not np.any((rest >= first) & (rest < last)):
+            return slice(first, last)
+        return np.array([x.ident() - 1 for x in node.walk()])
+
     def translate(self, shift, node=None):
         """Shifts coordinates of the branch at the given node.
 
@@ -248,31 +267,24 @@ class Morph():
             node (treem.Node): starting node (defaults to root).
         """
         node = node if node else self.root
-        for sec in node.sections():
-            points = self.coords(sec)  # NOSONAR (S1481) "Necessary for in-place NumPy modification"
-            points += shift
+        self.data[self.branch(node), SWC.X:SWC.Z + 1] += shift
 
     def rotate(self, axis, angle, node=None):
         """Rotates branch at the node.
 
-        Branch is traversed downstream from the given node.
+        Branch is rotated around the given node by one matrix product.
 
         Args:
             axis (float[3]): rotation axis.
-            angle (float): rotation angle in degrees.
+            angle (float): rotation angle in radians.
             node (treem.Node): starting node (defaults to root).
         """
         node = node if node else self.root
-        head = node.coord().copy()
-        for sec in node.sections():
-            points = self.coords(sec)
-            first = sec[0].ident() - 1
-            last = sec[-1].ident()
-            block = slice(first, last)
-            self.data[block, SWC.XYZ] = np.dot(rotation_matrix(axis, angle),
-                                               points.T).T
-        shift = head - node.coord()
-        self.translate(shift, node)
+        index = self.branch(node)
+        head = self.data[node.ident() - 1, SWC.XYZ].copy()
+        points = self.data[index, SWC.X:SWC.Z + 1]
+        rot = rotation_matrix(axis, angle)
+        self.data[index, SWC.X:SWC.Z + 1] = (points - head) @ rot.T + head
 
     def copy(self, node=None):
         """Copies branch at the node (defaults to root)."""
@@ -337,7 +349,7 @@ class Morph():
         self.__renumber()
 
 
-def _measure_forward(morph, d, center):
+def _measure_forward(morph, d, center, path):
     """Calculates metrics in forward traversal."""
     m = morph
     for stem in m.stems():
@@ -352,10 +364,8 @@ def _measure_forward(morph, d, center):
                 if node.parent.is_fork() and node.parent != m.root:
                     order = d[node.parent.ident()]['order'] + 1
                 dist = np.linalg.norm(center - node.coord())
-                path = d[node.parent.ident()]['path']
-                path += length
                 d[ident]['length'] = length
-                d[ident]['path'] = path
+                d[ident]['path'] = path[ident - 1]
                 d[ident]['xsec'] = xsec
                 d[ident]['xsec_rel'] = xsec / seclen
                 d[ident]['dist'] = dist
@@ -401,7 +411,7 @@ def get_segdata(morph):
         d[ident]['order'] = 0
         d[ident]['breadth'] = 0
         d[ident]['totlen'] = 0.0
-    _measure_forward(m, d, center)
+    _measure_forward(m, d, center, get_path(m))
     _measure_backward(m, d)
     return np.array([[i, d[i]['t'], d[i]['x'], d[i]['y'], d[i]['z'],
                       d[i]['r'], d[i]['p'],
@@ -417,6 +427,229 @@ class SEG():
      DIST, DEGREE, ORDER, BREADTH, TOTLEN) = range(16)
 
 
+class SEC():
+    """Definitions of the section data format."""
+    (I, T, DEGREE, ORDER, BREADTH, LENGTH, CONTRAC, AREA, VOLUME,  # noqa: E741
+     DIAM, XMIN, XMAX, YMIN, YMAX, ZMIN, ZMAX, DIST) = range(17)
+
+
+def get_parents(morph):
+    """Returns parent indices of the nodes, root refers to itself."""
+    parents = morph.data[:, SWC.P].astype(int) - 1
+    parents[0] = 0
+    return parents
+
+
+def get_segments(morph, parents=None):
+    """Computes length, area and volume of all segments at once.
+
+    Args:
+        morph (treem.Morph): neuron morphology.
+        parents (NumPy ndarray): parent indices (optional, see get_parents).
+
+    Returns:
+        length, area, volume (NumPy ndarray[N] each).
+    """
+    parents = parents if parents is not None else get_parents(morph)
+    coords = morph.data[:, SWC.XYZ]
+    h = np.linalg.norm(coords - coords[parents], axis=1)
+    a = morph.data[:, SWC.R]
+    # same base radius if parent is root
+    b = np.where(parents == 0, a, a[parents])
+    area = math.pi * (a + b) * np.sqrt((a - b) * (a - b) + h * h)
+    volume = math.pi / 3.0 * (a * a + a * b + b * b) * h
+    return h, area, volume
+
+
+def _section_tree(sec_parents):
+    """Returns pre-order traversal and branch orders of the section tree."""
+    nsec = len(sec_parents)
+    children = [[] for _ in range(nsec)]
+    for sec, parent in enumerate(sec_parents.tolist()[1:], 1):
+        children[parent].append(sec)
+    preorder = []
+    order = [0] * nsec
+    queue = [0]
+    while queue:
+        sec = queue.pop()
+        preorder.append(sec)
+        for child in children[sec]:
+            order[child] = order[sec] + 1
+        queue.extend(reversed(children[sec]))
+    return np.array(preorder), np.array(order)
+
+
+def get_sections(morph, parents=None):
+    """Computes section table.
+
+    Sections are found from the parent indices only, the data may be in
+    any order with parents preceding children (not only depth-first).
+    Arrays are indexed by section in data order of the section heads.
+
+    Args:
+        morph (treem.Morph): neuron morphology.
+        parents (NumPy ndarray): parent indices (optional, see get_parents).
+
+    Returns:
+        first, last (indices of head and tail nodes), preorder (order of
+        Morph.root.sections()), degree (of the tail), order, breadth
+        (NumPy ndarray[M] each) and secid (section of each node,
+        NumPy ndarray[N]).
+    """
+    parents = parents if parents is not None else get_parents(morph)
+    size = len(parents)
+    degree = np.bincount(parents[1:], minlength=size)
+    heads = np.ones(size, dtype=bool)
+    heads[1:] = (parents[1:] == 0) | (degree[parents[1:]] != 1)
+    first = np.flatnonzero(heads)
+    # head of each node, by pointer jumping along the section chains
+    head = np.where(heads, np.arange(size), parents)
+    while not np.all(heads[head]):
+        head = np.where(heads[head], head, head[head])
+    secid = np.cumsum(heads)[head] - 1
+    last = np.zeros(len(first), dtype=int)
+    np.maximum.at(last, secid, np.arange(size))
+    sec_parents = secid[parents[first]]
+    preorder, order = _section_tree(sec_parents)
+    breadth = (degree[last] == 0).astype(int)
+    for sec in preorder[:0:-1].tolist():
+        breadth[sec_parents[sec]] += breadth[sec]
+    return first, last, preorder, degree[last], order, breadth, secid
+
+
+def get_blocks(sections):
+    """Returns node permutation making sections contiguous blocks.
+
+    Nodes of a section keep the data order, which is the order along the
+    section, the permutation is the identity for depth-first data.
+
+    Args:
+        sections (tuple): section table (see get_sections).
+
+    Returns:
+        perm (node indices, NumPy ndarray[N]), starts (positions of the
+        section heads in perm, NumPy ndarray[M]).
+    """
+    secid = sections[6]
+    perm = np.argsort(secid, kind='stable')
+    return perm, np.searchsorted(secid[perm], np.arange(len(sections[0])))
+
+
+def get_path(morph, parents=None, length=None):
+    """Computes path distances of all nodes to root in one pass.
+
+    Segment lengths are accumulated along the tree in data order,
+    path[i] = path[parents[i]] + length[i], which is valid for any data
+    with parents preceding children.
+
+    Args:
+        morph (treem.Morph): neuron morphology.
+        parents (NumPy ndarray): parent indices (optional, see get_parents).
+        length (NumPy ndarray): segment lengths (optional, see get_segments).
+
+    Returns:
+        path distances (NumPy ndarray[N]).
+    """
+    parents = parents if parents is not None else get_parents(morph)
+    if length is None:
+        coords = morph.data[:, SWC.XYZ]
+        length = np.linalg.norm(coords - coords[parents], axis=1)
+    path = np.asarray(length, dtype=float).tolist()
+    for node, parent in enumerate(parents.tolist()[1:], 1):
+        path[node] += path[parent]
+    return np.array(path)
+
+
+def get_secdata(morph, parents=None, sections=None, segments=None):
+    """Collects section data.
+
+    Per-segment metrics are computed once and aggregated per section
+    over the section ids of the nodes. Rows follow the order of
+    Morph.root.sections(), columns are defined in SEC.
+
+    Args:
+        morph (treem.Morph): neuron morphology.
+        parents (NumPy ndarray): parent indices (optional, see get_parents).
+        sections (tuple): section table (optional, see get_sections).
+        segments (tuple): segment metrics (optional, see get_segments).
+
+    Returns:
+        section data (NumPy ndarray[M, 17]).
+    """
+    data = morph.data
+    parents = parents if parents is not None else get_parents(morph)
+    sections = sections if sections is not None else get_sections(morph, parents)
+    segments = segments if segments is not None else get_segments(morph, parents)
+    first, last, preorder, degree, order, breadth, secid = sections
+    length, area, volume = segments
+    coords = data[:, SWC.XYZ]
+    perm, starts = get_blocks(sections)
+    count = np.bincount(secid, minlength=len(first))
+    seclen = np.bincount(secid, weights=length, minlength=len(first))
+    chord = np.linalg.norm(coords[last] - coords[parents[first]], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contrac = chord / seclen
+    diam = 2 * np.bincount(secid, weights=data[:, SWC.R], minlength=len(first)) / count
+    cmin = np.minimum.reduceat(coords[perm], starts)
+    cmax = np.maximum.reduceat(coords[perm], starts)
+    dist = np.maximum.reduceat(np.linalg.norm(coords - coords[0], axis=1)[perm], starts)
+    secdata = np.column_stack([
+        data[first, SWC.I], data[first, SWC.T],
+        degree, order, breadth,
+        seclen, contrac,
+        np.bincount(secid, weights=area, minlength=len(first)),
+        np.bincount(secid, weights=volume, minlength=len(first)),
+        diam,
+        cmin[:, 0], cmax[:, 0], cmin[:, 1], cmax[:, 1], cmin[:, 2], cmax[:, 2],
+        dist])
+    return secdata[preorder]
+
+
+def get_barcode(morph, values, parents=None, sections=None):
+    """Computes persistence barcode of the neurites (TMD).
+
+    Sections are processed in reverse data order of their heads, so
+    that children precede parents. At each branching the component with the largest
+    value survives, the others die at the value of the branching point.
+    Components reaching the soma die there.
+
+    Args:
+        morph (treem.Morph): neuron morphology.
+        values (NumPy ndarray): filtration values of the nodes, e.g.
+            radial (SEG.DIST) or path (SEG.PATH) distances.
+        parents (NumPy ndarray): parent indices (optional, see get_parents).
+        sections (tuple): section table (optional, see get_sections).
+
+    Returns:
+        bars (NumPy ndarray[K, 2] of birth, death), types (NumPy ndarray[K]).
+    """
+    parents = parents if parents is not None else get_parents(morph)
+    sections = sections if sections is not None else get_sections(morph, parents)
+    first, last, secid = sections[0], sections[1], sections[6]
+    sec_parents = secid[parents[first]].tolist()
+    sec_types = morph.data[first, SWC.T].astype(int).tolist()
+    tail_values = np.asarray(values, dtype=float)[last].tolist()
+    alive = [None] * len(first)
+    bars, types = [], []
+    for sec in range(len(first) - 1, 0, -1):
+        if sec_types[sec] == SWC.SOMA:
+            continue
+        value, point_type = alive[sec] or (tail_values[sec], sec_types[sec])
+        parent = sec_parents[sec]
+        death = tail_values[parent]
+        if sec_types[parent] == SWC.SOMA:
+            bars.append((value, death))
+            types.append(point_type)
+        elif alive[parent] is None:
+            alive[parent] = value, point_type
+        else:
+            if value > alive[parent][0]:
+                alive[parent], (value, point_type) = (value, point_type), alive[parent]
+            bars.append((value, death))
+            types.append(point_type)
+    return np.reshape(bars, (-1, 2)), np.array(types, dtype=int)
+
+
 class DGram(Morph):
     """Neuron dendrogram representation."""
     def __init__(self, morph=None, source=None, data=None, types=SWC.TYPES,
@@ -445,14 +678,10 @@ class DGram(Morph):
 
 
     def _position_x(self, graph):
-        """Set X coordinate to path length."""
-        segdata = get_segdata(graph)
-        for sec in graph.root.sections():
-            for node in sec:
-                ident = node.ident()
-                data = graph.data[ident - 1]
-                segd = segdata[ident - 1]
-                data[SWC.X] = segd[SEG.PATH]
+        """Set X coordinate to path length (zero in soma)."""
+        path = get_path(graph)
+        path[graph.data[:, SWC.T] == SWC.SOMA] = 0.0
+        graph.data[:, SWC.X] = path
 
 
     def _position_z(self, graph, morph, ystep, zstep, zorder):
@@ -1,5 +1,6 @@
 """Utilities for manipulating geometry of morphology reconstructions."""
 
+import itertools
 import math
 
 import numpy as np
@@ -58,7 +59,7 @@ def rotation(u, v):
     return axis, angle
 
 
-def repair_branch(cmorph, cut, rmorph, rep, force=False, keep_radii=False):
+def repair_branch(cmorph, cut, rmorph, rep, force=False, keep_radii=False, accept=None):
     """Attempts to extend cut neurite using intact branch.
 
     Args:
@@ -68,6 +69,8 @@ def repair_branch(cmorph, cut, rmorph, rep, force=False, keep_radii=False):
         rep (treem.Node): undamaged branch start node, from rmorph.
         force (bool): force repair if branch is too short.
         keep_radii (bool): do not scale radii of repaired branch.
+        accept (callable): test of the placed branch (treem.Morph)
+            before grafting, branch is not grafted if False.
 
     Returns:
         True if repaired.
@@ -106,8 +109,9 @@ def repair_branch(cmorph, cut, rmorph, rep, force=False, keep_radii=False):
         tree.rotate(axis, angle)
         shift = (target.coord() - tree.root.coord() + target.coord() - target.parent.coord())
         tree.translate(shift)
-        cmorph.graft(tree, target)
-        done = 1
+        if accept is None or accept(tree):
+            cmorph.graft(tree, target)
+            done = 1
     return done
 
 
@@ -121,15 +125,346 @@ def sample(points, num):
     Returns:
         array of 4D points (NumPy ndarray[4]).
     """
-    num = num if num > 1 else 2
-    links = [norm(p[0:3] - q[0:3]) for p, q in zip(points[:-1], points[1:])]
-    tp = [sum(links[0:i]) for i in range(len(links) + 1)]
-    xp, yp, zp, rp = points.T
-    t = np.linspace(tp[0], tp[-1], num, endpoint=True)
-    return np.array([np.interp(t, tp, xp),
-                     np.interp(t, tp, yp),
-                     np.interp(t, tp, zp),
-                     np.interp(t, tp, rp)]).T
+    return sample_blocks(points, np.array([0]), np.array([num]))
+
+
+def sample_blocks(points, starts, nums):
+    """Samples several polylines at once using linear interpolation.
+
+    Path length is accumulated over all points, polylines are separated
+    by a gap, so that one interpolation covers all of them.
+
+    Args:
+        points (NumPy ndarray[N, 4]): 4D data points (x,y,z,r) of the
+            polylines, concatenated.
+        starts (NumPy ndarray[M]): indices of the first points of the polylines.
+        nums (NumPy ndarray[M]): sample sizes (at least 2).
+
+    Returns:
+        array of 4D points (NumPy ndarray[K, 4]), samples of the polylines
+        in the order of starts.
+    """
+    if not len(starts):
+        return np.zeros((0, 4))
+    nums = np.maximum(nums, 2)
+    links = np.linalg.norm(np.diff(points[:, :3], axis=0), axis=1)
+    links[starts[1:] - 1] = 1.0
+    tp = np.concatenate([[0.0], np.cumsum(links)])
+    stops = np.append(starts[1:], len(points)) - 1
+    block = np.repeat(np.arange(len(starts)), nums)
+    step = np.arange(nums.sum()) - np.repeat(np.cumsum(nums) - nums, nums)
+    lo, hi = tp[starts][block], tp[stops][block]
+    t = lo + (hi - lo) * step / (nums[block] - 1)
+    return np.column_stack([np.interp(t, tp, x) for x in points.T])
+
+
+def voxelize(starts, ends, res):
+    """Splits line segments at voxel boundaries.
+
+    Crossings with voxel planes are computed for all segments at once,
+    pieces between consecutive crossings are assigned to voxels.
+
+    Args:
+        starts (NumPy ndarray[N, 3]): start points of segments.
+        ends (NumPy ndarray[N, 3]): end points of segments.
+        res (float): voxel size.
+
+    Returns:
+        voxel indices (NumPy ndarray[M, 3]), piece lengths (NumPy ndarray[M]).
+    """
+    a = np.asarray(starts, dtype=float) / res
+    b = np.asarray(ends, dtype=float) / res
+    ia = np.floor(a).astype(int)
+    ib = np.floor(b).astype(int)
+    size = len(a)
+    segs = [np.arange(size), np.arange(size)]
+    params = [np.zeros(size), np.ones(size)]
+    for axis in range(3):
+        count = np.abs(ib[:, axis] - ia[:, axis])
+        index = np.repeat(np.arange(size), count)
+        offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        planes = np.repeat(np.minimum(ia[:, axis], ib[:, axis]), count) + 1 + offset
+        segs.append(index)
+        params.append((planes - a[index, axis]) / (b[index, axis] - a[index, axis]))
+    segs = np.concatenate(segs)
+    params = np.concatenate(params)
+    order = np.lexsort((params, segs))
+    segs, params = segs[order], params[order]
+    same = segs[1:] == segs[:-1]
+    seg, t0, t1 = segs[:-1][same], params[:-1][same], params[1:][same]
+    length = (t1 - t0) * np.linalg.norm(b - a, axis=1)[seg] * res
+    mid = a[seg] + ((t0 + t1) / 2)[:, np.newaxis] * (b - a)[seg]
+    keep = length > 0
+    return np.floor(mid[keep]).astype(int), length[keep]
+
+
+class SpatialHash():
+    """Set of grid cells occupied by line segments."""
+
+    def __init__(self, size):
+        """Initializes empty grid.
+
+        Args:
+            size (float): cell size.
+        """
+        self.size = size
+        self.cells = set()
+
+    def _cells(self, starts, ends):
+        """Returns cells crossed by the segments (NumPy ndarray[M, 3])."""
+        return np.unique(voxelize(starts, ends, self.size)[0], axis=0)
+
+    def add(self, starts, ends):
+        """Marks cells crossed by the segments as occupied."""
+        self.cells.update(map(tuple, self._cells(starts, ends).tolist()))
+
+    def count(self, starts, ends, center=None):
+        """Returns number of occupied cells crossed by the segments.
+
+        Args:
+            starts (NumPy ndarray[N, 3]): start points of segments.
+            ends (NumPy ndarray[N, 3]): end points of segments.
+            center (float[3]): cells next to this point are not counted.
+
+        Returns:
+            number of cells (int).
+        """
+        cells = self._cells(starts, ends)
+        if center is not None:
+            near = np.floor(np.asarray(center, dtype=float) / self.size)
+            cells = cells[np.any(np.abs(cells - near) > 1, axis=1)]
+        return sum(1 for cell in map(tuple, cells.tolist()) if cell in self.cells)
+
+
+def _hull_simplex(points, eps):
+    """Returns vertices of the initial tetrahedron or None if degenerate."""
+    ext = np.concatenate([np.argmin(points, axis=0), np.argmax(points, axis=0)])
+    dist = np.linalg.norm(points[ext, np.newaxis] - points[ext], axis=2)
+    i, j = np.unravel_index(np.argmax(dist), dist.shape)
+    a, b = ext[i], ext[j]
+    if dist[i, j] < eps:
+        return None
+    line = points[b] - points[a]
+    c = np.argmax(np.linalg.norm(np.cross(points - points[a], line), axis=1))
+    normal = np.cross(line, points[c] - points[a])
+    if np.linalg.norm(normal) < eps * np.linalg.norm(line):
+        return None
+    height = (points - points[a]) @ normal / np.linalg.norm(normal)
+    d = np.argmax(np.abs(height))
+    if abs(height[d]) < eps:
+        return None
+    return (a, b, c, d) if height[d] < 0 else (a, c, b, d)
+
+
+def _unit_normals(tri):
+    """Returns unit normals of triangles (NumPy ndarray[K, 3, 3])."""
+    u, v = tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]
+    normals = np.column_stack([u[:, 1] * v[:, 2] - u[:, 2] * v[:, 1],
+                               u[:, 2] * v[:, 0] - u[:, 0] * v[:, 2],
+                               u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]])
+    return normals / np.sqrt(np.einsum('ij,ij->i', normals, normals))[:, np.newaxis]
+
+
+class _Hull():
+    """Incremental convex hull (quickhull) of points.
+
+    Faces are oriented outwards, normals and offsets of all faces are
+    kept in arrays grown by doubling, neighbor faces are found by the
+    opposite directed edge.
+    """
+
+    def __init__(self, points, eps, simplex):
+        self.points = points
+        self.eps = eps
+        self.verts = np.zeros((16, 3), dtype=int)
+        self.normals = np.zeros((16, 3))
+        self.offsets = np.zeros(16)
+        self.alive = np.zeros(16, dtype=bool)
+        self.size = 0
+        self.edges = {}
+        self.outside = {}
+        a, b, c, d = simplex
+        candidates = np.setdiff1d(np.arange(len(points)), simplex)
+        self.pending = self._add_faces([(a, b, c), (a, d, b), (b, d, c), (a, c, d)],
+                                       candidates)
+
+    def _grow(self, size):
+        """Doubles array capacity until size faces fit."""
+        cap = len(self.offsets)
+        while cap < size:
+            cap *= 2
+        if cap > len(self.offsets):
+            extra = cap - len(self.offsets)
+            self.verts = np.concatenate([self.verts, np.zeros((extra, 3), dtype=int)])
+            self.normals = np.concatenate([self.normals, np.zeros((extra, 3))])
+            self.offsets = np.concatenate([self.offsets, np.zeros(extra)])
+            self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+
+    def _add_faces(self, faces, candidates):
+        """Adds faces and assigns candidates to the face they are highest above.
+
+        Returns:
+            new faces with outside points.
+        """
+        lo, hi = self.size, self.size + len(faces)
+        self._grow(hi)
+        verts = np.array(faces, dtype=int)
+        tri = self.points[verts]
+        normals = _unit_normals(tri)
+        self.verts[lo:hi] = verts
+        self.normals[lo:hi] = normals
+        self.offsets[lo:hi] = np.einsum('ij,ij->i', normals, tri[:, 0])
+        self.alive[lo:hi] = True
+        self.size = hi
+        for face, (p, q, r) in enumerate(faces, lo):
+            self.edges[(p, q)] = self.edges[(q, r)] = self.edges[(r, p)] = face
+        height = self.points[candidates] @ normals.T - self.offsets[lo:hi]
+        best = np.argmax(height, axis=1)
+        out = height[np.arange(len(candidates)), best] > self.eps
+        candidates, best = candidates[out], best[out]
+        order = np.argsort(best, kind='stable')
+        bounds = np.searchsorted(best[order], np.arange(len(faces) + 1))
+        pending = []
+        for index in np.flatnonzero(np.diff(bounds)).tolist():
+            self.outside[lo + index] = candidates[order[bounds[index]:bounds[index + 1]]]
+            pending.append(lo + index)
+        return pending
+
+    def _visible(self, face, point):
+        """Finds faces visible from the point and their horizon (BFS from face)."""
+        visible, hidden, horizon = {face}, set(), []
+        queue = [face]
+        while queue:
+            current = queue.pop()
+            p, q, r = self.verts[current].tolist()
+            for edge in ((p, q), (q, r), (r, p)):
+                neighbor = self.edges[edge[::-1]]
+                if neighbor in visible:
+                    continue
+                if neighbor not in hidden:
+                    if self.normals[neighbor] @ point - self.offsets[neighbor] > self.eps:
+                        visible.add(neighbor)
+                        queue.append(neighbor)
+                        continue
+                    hidden.add(neighbor)
+                horizon.append(edge)
+        return visible, horizon
+
+    def build(self):
+        """Adds the farthest outside point of a pending face until none is left."""
+        while self.pending:
+            face = self.pending.pop()
+            if not self.alive[face] or face not in self.outside:
+                continue
+            outside = self.outside[face]
+            height = self.points[outside] @ self.normals[face] - self.offsets[face]
+            eye = outside[np.argmax(height)]
+            visible, horizon = self._visible(face, self.points[eye])
+            candidates = []
+            for current in visible:
+                self.alive[current] = False
+                candidates.append(self.outside.pop(current, outside[:0]))
+                p, q, r = self.verts[current].tolist()
+                for edge in ((p, q), (q, r), (r, p)):
+                    if self.edges.get(edge) == current:
+                        del self.edges[edge]
+            candidates = np.concatenate(candidates)
+            candidates = candidates[candidates != eye]
+            self.pending += self._add_faces([(p, q, eye) for p, q in horizon], candidates)
+        return self.verts[:self.size][self.alive[:self.size]]
+
+
+def _hull_faces(points, eps):
+    """Returns faces (vertex indices) of the convex hull or None if degenerate."""
+    simplex = _hull_simplex(points, eps)
+    if simplex is None:
+        return None
+    return _Hull(points, eps, simplex).build()
+
+
+_DIRECTIONS = np.array([x for x in itertools.product((-1, 0, 1), repeat=3)
+                        if np.count_nonzero(x) in (1, 3)], dtype=float)
+
+
+def _extreme_filter(points, eps):
+    """Returns points that are not inside the hull of the extreme points.
+
+    Extreme points along the axes and diagonals span a polytope inside
+    the hull (Akl-Toussaint heuristic), points strictly inside of it
+    cannot be hull vertices.
+    """
+    extreme = np.unique(np.argmax(points @ _DIRECTIONS.T, axis=0))
+    faces = _hull_faces(points[extreme], eps) if len(extreme) > 3 else None
+    if faces is None:
+        return points
+    tri = points[extreme][faces]
+    normals = _unit_normals(tri)
+    offsets = np.einsum('ij,ij->i', normals, tri[:, 0])
+    keep = np.zeros(len(points), dtype=bool)
+    for lo in range(0, len(points), 65536):
+        block = points[lo:lo + 65536]
+        keep[lo:lo + 65536] = np.any(block @ normals.T - offsets >= -eps, axis=1)
+    return points[keep]
+
+
+def convex_hull(points):
+    """Computes area and volume of the convex hull (quickhull).
+
+    Points inside the polytope of the extreme points are discarded
+    first. Faces visible from a new vertex are found by traversal of
+    the neighbor faces, outside points of the removed faces are assigned
+    to the new faces at once.
+
+    Args:
+        points (NumPy ndarray[N, 3]): point coordinates.
+
+    Returns:
+        area, volume (float); zeros if points are coplanar.
+    """
+    points = np.unique(np.asarray(points, dtype=float), axis=0)
+    if len(points) < 4:
+        return 0.0, 0.0
+    eps = 1e-9 * max(1.0, np.abs(points).max())
+    points = _extreme_filter(points, eps)
+    faces = _hull_faces(points, eps)
+    if faces is None:
+        return 0.0, 0.0
+    tri = points[faces]
+    cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    area = np.linalg.norm(cross, axis=1).sum() / 2
+    volume = np.einsum('ij,ij->i', tri[:, 0] - points[0], cross).sum() / 6
+    return float(area), float(volume)
+
+
+def principal_extents(points, groups, ngroups):
+    """Computes extents along principal axes of several point groups.
+
+    Covariance matrices of all groups are accumulated at once and
+    diagonalized as a stack.
+
+    Args:
+        points (NumPy ndarray[N, 3]): point coordinates.
+        groups (NumPy ndarray[N]): group index of the points.
+        ngroups (int): number of groups.
+
+    Returns:
+        extents (NumPy ndarray[ngroups, 3]), in decreasing order of variance.
+    """
+    count = np.bincount(groups, minlength=ngroups).astype(float)
+    count[count == 0] = 1.0
+    mean = np.stack([np.bincount(groups, points[:, i], ngroups) for i in range(3)],
+                    axis=1) / count[:, np.newaxis]
+    centered = points - mean[groups]
+    prod = centered[:, :, np.newaxis] * centered[:, np.newaxis, :]
+    cov = np.zeros((ngroups, 3, 3))
+    np.add.at(cov, groups, prod)
+    _, axes = np.linalg.eigh(cov)
+    proj = np.einsum('ni,nij->nj', centered, axes[groups][:, :, ::-1])
+    lo = np.full((ngroups, 3), np.inf)
+    hi = np.full((ngroups, 3), -np.inf)
+    np.minimum.at(lo, groups, proj)
+    np.maximum.at(hi, groups, proj)
+    return np.where(np.isfinite(hi - lo), hi - lo, 0.0)
 
 
 def fibonacci_sphere(npoints=100):
@@ -1,32 +1,65 @@
 """Plotting utilities."""
 
 import numpy as np
+from matplotlib.collections import LineCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 
 from treem.io import SWC
 
 
-def plot_tree(ax, tree, data, **kwargs):
+def get_segments3d(data, index):
+    """Returns segments from parents to the given nodes.
+
+    Args:
+        data (NumPy ndarray): raw data of morphology Morph.
+        index (NumPy ndarray): indices of the end nodes into the data.
+
+    Returns:
+        segments (NumPy ndarray[N, 2, 3]).
+    """
+    parents = data[index, SWC.P].astype(int) - 1
+    return np.stack([data[parents][:, SWC.XYZ], data[index][:, SWC.XYZ]], axis=1)
+
+
+def plot_segments(ax, segments, single_line=False, **kwargs):
+    """Plots line segments as one artist.
+
+    Segments are drawn as Line3DCollection, or as a single line with
+    segments separated by NaN points.
+
+    Args:
+        ax: matplotlib axes object.
+        segments (NumPy ndarray[N, 2, 3]): start and end points of segments.
+        single_line (bool): plot NaN-separated line instead of collection.
+        kwargs: arguments for matplotlib plot() or Line3DCollection.
+    """
+    if not len(segments):
+        return
+    if single_line:
+        gaps = np.full((len(segments), 1, 3), np.nan)
+        x, y, z = np.concatenate([segments, gaps], axis=1).reshape(-1, 3).T
+        ax.plot(x, y, z, **kwargs)
+        return
+    if 'c' in kwargs:
+        kwargs['color'] = kwargs.pop('c')
+    had_data = ax.has_data()
+    ax.add_collection3d(Line3DCollection(segments, **kwargs))
+    x, y, z = segments.reshape(-1, 3).T
+    ax.auto_scale_xyz(x, y, z, had_data)
+
+
+def plot_tree(ax, tree, data, single_line=False, **kwargs):
     """Plots entire branch.
 
     Args:
         ax: matplotlib axes object.
         tree (treem.Node): branch start node.
         data (NumPy ndarray): raw data of morphology Morph.
-        kwargs: arguments for matplotlib plot().
+        single_line (bool): plot NaN-separated line instead of collection.
+        kwargs: arguments for matplotlib plot() or Line3DCollection.
     """
-    for sec in tree.sections():
-        first = sec[0].ident() - 1
-        last = sec[-1].ident()
-        block = slice(first, last)
-        x, y, z = data[block, SWC.XYZ].T
-        ax.plot(x, y, z, **kwargs)
-    for bif in tree.forks():
-        b = bif.coord()
-        for child in bif.siblings:
-            c = child.coord()
-            a = np.array([b, c])
-            x, y, z = a.T
-            ax.plot(x, y, z, **kwargs)
+    index = np.array([x.ident() - 1 for x in tree.walk()][1:], dtype=int)
+    plot_segments(ax, get_segments3d(data, index), single_line=single_line, **kwargs)
 
 
 def plot_section(ax, tree, data, **kwargs):
@@ -47,34 +80,70 @@ def plot_section(ax, tree, data, **kwargs):
         break
 
 
-def plot_neuron(ax, morph, types=SWC.TYPES, colors=None, linewidth=1):
+def _neurite_groups(morph, types, colors):
+    """Returns indices of neurite nodes grouped by color ({colspec: index})."""
+    nodes = np.arange(len(morph.data))
+    groups = {}
+    for stem in morph.stems():
+        if stem.type() in types:
+            groups.setdefault(colors[stem.type()], []).append(nodes[morph.branch(stem)])
+    return {color: np.concatenate(index) for color, index in groups.items()}
+
+
+def plot_neuron(ax, morph, types=SWC.TYPES, colors=None, linewidth=1, single_line=False):
     """Plots neuron morphology.
 
+    Neurites of the same color are plotted as one artist.
+
     Args:
         ax: matplotlib axes object.
         morph (treem.Morph): neuron morphology.
         types (int iterable): point types to be displayed.
         colors (dict): colors for point types ({pt: colspec}).
         linewidth (int): line width.
+        single_line (bool): plot NaN-separated lines instead of collections.
     """
     colors = colors if colors else {t: f'C{t}' for t in types}
-    r = morph.root.coord()
-    for stem in morph.stems():
-        if stem.type() in types:
-            x, y, z = np.array([r, stem.coord()]).T
-            ax.plot(x, y, z, c=colors[stem.type()], lw=linewidth)
-            plot_tree(ax, stem, morph.data, c=colors[stem.type()],
-                      lw=linewidth)
+    for color, index in _neurite_groups(morph, types, colors).items():
+        plot_segments(ax, get_segments3d(morph.data, index),
+                      single_line=single_line, color=color, lw=linewidth)
     if SWC.SOMA in types:
         soma_points = morph.data[np.nonzero(morph.data[:, SWC.T] == SWC.SOMA)]
         x, y, z = soma_points[:, SWC.XYZ].T
         ax.plot(x, y, z, linestyle='', marker='o', markersize=10,
                 c=colors[SWC.SOMA], alpha=0.25)
-    x, y, z = r
+    x, y, z = morph.root.coord()
     ax.plot([x], [y], [z], linestyle='', marker='o', markersize=5,
             color='black')
 
 
+def plot_projection(ax, morph, proj='xy', types=SWC.TYPES, colors=None, linewidth=1):
+    """Plots orthogonal projection of neuron morphology on 2D axes.
+
+    Neurites of the same color are plotted as one LineCollection.
+
+    Args:
+        ax: matplotlib 2D axes object.
+        morph (treem.Morph): neuron morphology.
+        proj (str): projection plane {xy,xz,yz}.
+        types (int iterable): point types to be displayed.
+        colors (dict): colors for point types ({pt: colspec}).
+        linewidth (int): line width.
+    """
+    colors = colors if colors else {t: f'C{t}' for t in types}
+    plane = ['xyz'.index(x) for x in proj]
+    for color, index in _neurite_groups(morph, types, colors).items():
+        segments = get_segments3d(morph.data, index)[:, :, plane]
+        ax.add_collection(LineCollection(segments, color=color, lw=linewidth))
+    coords = morph.data[:, SWC.XYZ][:, plane]
+    if SWC.SOMA in types:
+        soma_points = coords[morph.data[:, SWC.T] == SWC.SOMA]
+        ax.plot(*soma_points.T, linestyle='', marker='o', markersize=10,
+                c=colors[SWC.SOMA], alpha=0.25)
+    ax.plot(*coords[:1].T, linestyle='', marker='o', markersize=5, color='black')
+    ax.autoscale_view()
+
+
 def plot_points(ax, morph, ids, types=SWC.TYPES, show_id=False, markersize=6):
     """Plots marker points.
 
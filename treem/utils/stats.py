@@ -0,0 +1,208 @@
+"""Online statistics for streams of morphometric data."""
+
+import math
+
+import numpy as np
+
+
+class P2Quantile():
+    """Quantile estimate by the P-square algorithm (Jain & Chlamtac, 1985).
+
+    Keeps five markers only, memory does not depend on the sample size.
+    """
+
+    def __init__(self, p=0.5):
+        """Inits quantile estimator for probability p (float)."""
+        self.p = p
+        self.heights = []
+        self.pos = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.incr = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        """Updates estimate with a new value (float)."""
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = max(i for i in range(4) if q[i] <= x)
+        n = self.pos
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.incr[i]
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                h = self._parabolic(i, d)
+                q[i] = h if q[i - 1] < h < q[i + 1] else self._linear(i, d)
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        """Piecewise-parabolic prediction of the marker height."""
+        q, n = self.heights, self.pos
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def _linear(self, i, d):
+        """Linear prediction of the marker height."""
+        q, n = self.heights, self.pos
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def value(self):
+        """Returns current quantile estimate (float)."""
+        if not self.heights:
+            return math.nan
+        if len(self.heights) < 5 or self.pos[4] < 5:
+            return float(np.quantile(self.heights, self.p))
+        return self.heights[2]
+
+
+class Histogram():
+    """Histogram with fixed number of bins and doubling range.
+
+    The range is set by the first two distinct values and doubled
+    (merging neighbour bins) whenever a value falls outside.
+    """
+
+    def __init__(self, bins=16):
+        """Inits histogram with given (even) number of bins."""
+        self.bins = bins + bins % 2
+        self.counts = [0] * self.bins
+        self.lo = None
+        self.width = 0.0
+        self.first = 0
+
+    def add(self, x):
+        """Adds value to histogram (float)."""
+        if self.lo is None:
+            self.lo = x
+        if self.width == 0.0:
+            if x == self.lo:
+                self.first += 1
+                return
+            self.width = abs(x - self.lo) / (self.bins - 1)
+            self.counts[0 if self.lo < x else -1] = self.first
+            self.lo = min(self.lo, x)
+        while x < self.lo or x >= self.lo + self.width * self.bins:
+            self._expand(x < self.lo)
+        index = min(int((x - self.lo) / self.width), self.bins - 1)
+        # keep consistent with rounding of edges()
+        if index > 0 and x < self.lo + index * self.width:
+            index -= 1
+        elif index < self.bins - 1 and x >= self.lo + (index + 1) * self.width:
+            index += 1
+        self.counts[index] += 1
+
+    def _expand(self, down):
+        """Doubles histogram range downwards or upwards."""
+        merged = [a + b for a, b in zip(self.counts[::2], self.counts[1::2])]
+        empty = [0] * (self.bins // 2)
+        if down:
+            self.lo -= self.width * self.bins
+            self.counts = empty + merged
+        else:
+            self.counts = merged + empty
+        self.width *= 2
+
+    def edges(self):
+        """Returns bin edges (list)."""
+        if self.width == 0.0:
+            return [self.lo, self.lo] if self.lo is not None else []
+        return [self.lo + i * self.width for i in range(self.bins + 1)]
+
+    def hist(self):
+        """Returns bin counts (list)."""
+        return self.counts if self.width > 0.0 else [self.first] if self.first else []
+
+
+class OnlineStats():
+    """Summary statistics of a data stream in constant memory.
+
+    Mean and variance are updated by Welford's algorithm, quantiles
+    are estimated by P2Quantile, distribution is kept in Histogram.
+    NaN values are ignored.
+    """
+
+    def __init__(self, quantiles=(0.25, 0.5, 0.75), bins=16):
+        """Inits statistics with quantile probabilities and number of bins."""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+        self.histogram = Histogram(bins)
+
+    def add(self, x):
+        """Updates statistics with a new value (float)."""
+        x = float(x)
+        if math.isnan(x):
+            return
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        for quantile in self.quantiles:
+            quantile.add(x)
+        self.histogram.add(x)
+
+    def std(self):
+        """Returns sample standard deviation (float)."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self):
+        """Returns statistics as a dictionary."""
+        stats = {'count': self.count, 'mean': self.mean, 'std': self.std(),
+                 'min': self.min, 'max': self.max}
+        for quantile in self.quantiles:
+            stats[f'q{quantile.p * 100:g}'] = quantile.value()
+        stats['hist'] = {'edges': self.histogram.edges(),
+                         'counts': self.histogram.hist()}
+        return stats
+
+
+def persistence_images(bars, index, size, bounds, bins=50, bandwidth=None):
+    """Computes persistence images of many barcodes on a common grid.
+
+    Each bar is smoothed by a separable Gaussian kernel, kernel values
+    along both axes are computed for all bars at once, images are
+    summed per barcode and scaled to maximum 1.
+
+    Args:
+        bars (NumPy ndarray[K, 2]): bars (birth, death) of all barcodes.
+        index (NumPy ndarray[K]): barcode index of the bars.
+        size (int): number of barcodes.
+        bounds (tuple): (lower, upper) limits of the grid.
+        bins (int): number of grid points per axis.
+        bandwidth (float): kernel width [1/25 of the range].
+
+    Returns:
+        images (NumPy ndarray[size, bins, bins]), birth along axis 1.
+    """
+    grid = np.linspace(bounds[0], bounds[1], bins)
+    bandwidth = bandwidth or (bounds[1] - bounds[0]) / 25 or 1.0
+    kernel = [np.exp(-0.5 * ((grid - bars[:, [axis]]) / bandwidth)**2)
+              for axis in (0, 1)]
+    order = np.argsort(index, kind='stable')
+    index = np.asarray(index)[order]
+    births, deaths = kernel[0][order], kernel[1][order]
+    images = np.zeros((size, bins, bins))
+    ends = np.searchsorted(index, np.arange(size + 1))
+    for cell in np.flatnonzero(np.diff(ends)):
+        block = slice(ends[cell], ends[cell + 1])
+        images[cell] = births[block].T @ deaths[block]
+    peak = images.max(axis=(1, 2), keepdims=True)
+    return np.divide(images, peak, out=images, where=peak > 0)